@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 from app.database import get_db, get_ocs_db
-from app.services import inventory
+from app.services import inventory, ocs
+from app.core.etag import content_etag, is_not_modified, not_modified, set_etag
+from app.core.deps import get_current_editor_user
 
 router = APIRouter()
 
@@ -29,12 +34,41 @@ def audit_inventory(
         
     return result
 
-@router.get("/inventory/status")
-def get_inventory_status(
+@router.post("/inventory/audit/bindings")
+def bind_audit_matches(
     local_db: Session = Depends(get_db),
-    ocs_db: Session = Depends(get_ocs_db)
+    ocs_db: Session = Depends(get_ocs_db),
+    current_user = Depends(get_current_editor_user)
 ):
+    """
+    Binds the audit's `bindable` computers (same name as an OCS machine) to their
+    OCS hardware id. The audit itself only reports them.
+    """
+    try:
+        result = inventory.bind_audit_matches(local_db, ocs_db)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to record bindings: {getattr(e, 'orig', e)}")
+    if "error" in result:
+        raise HTTPException(status_code=503, detail=result["error"])
+    if result["bound"]:
+        for match in result["bound"]:
+            ocs.machine_cache.invalidate(match["ocs_name"].upper())
+        inventory.invalidate_status()
+    return result
+
+@router.get("/inventory/status")
+def get_inventory_status(request: Request):
     """
     Returns a simple map of NodeID -> Status Color (green, gray, red).
+    Served from the shared status cache; `Age` tells how old the map is (seconds).
+    The ETag is a hash of the map, so unchanged polls are answered with 304.
     """
-    return inventory.get_node_status_map(local_db, ocs_db)
+    status_map, age = inventory.get_cached_status_map()
+    response = JSONResponse(jsonable_encoder(status_map))
+    etag = content_etag(response.body)
+    if is_not_modified(request, etag):
+        response = not_modified(etag)
+    else:
+        set_etag(response, etag)
+    response.headers["Age"] = str(int(age))
+    return response
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.database import get_db, get_ocs_db
+from app.database import get_db, get_ocs_db, ocs_breaker
+from app.services import health
 
 router = APIRouter()
 
@@ -12,29 +12,8 @@ def test_db_connections(
 ):
     """
     Diagnose database connections.
-    Returns status for 'local' and 'ocs'.
+    Returns status for 'local' and 'ocs', plus the OCS circuit breaker state.
     """
-    status = {
-        "local": "UNKNOWN",
-        "ocs": "UNKNOWN"
-    }
-
-    # Check Local DB
-    try:
-        local_db.execute(text("SELECT 1"))
-        status["local"] = "OK"
-    except Exception as e:
-        status["local"] = f"ERROR: {str(e)}"
-
-    # Check OCS DB
-    if ocs_db is None:
-        status["ocs"] = "DESATIVADO (Engine não inicializada ou URL não configurada)"
-    else:
-        try:
-            # Try a real query to Hardware table (MySQL)
-            result = ocs_db.execute(text("SELECT count(*) FROM hardware")).scalar()
-            status["ocs"] = f"OK (Machines Found: {result})"
-        except Exception as e:
-            status["ocs"] = f"ERROR: Connection Failed. Details: {str(e)}"
-
+    status = health.check_connections(local_db, ocs_db)
+    status["ocs_breaker"] = ocs_breaker.to_dict()
     return status
@@ -0,0 +1,40 @@
+import asyncio
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from app.services.events import hub, CLOSED
+
+router = APIRouter()
+
+# Comment line sent when idle so proxies don't close the connection
+KEEPALIVE_SECONDS = 15
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events channel replacing client-side polling.
+    Events: 'nodes' (node edits, then sync via /api/nodes/changes), 'export' (job progress),
+    'status' (NodeID -> color map), 'health' (same body as /api/test-db).
+    """
+    queue = hub.subscribe()
+
+    async def stream():
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ": keepalive\n\n"
+                if message is CLOSED:
+                    # Dropped as too slow: end the response so the EventSource reconnects
+                    break
+                yield message
+        finally:
+            hub.unsubscribe(queue)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no" # Disable nginx buffering (npm-rede reverse proxy)
+    }
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
@@ -1,134 +1,73 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.api.ocs import get_ocs_db
-from app.models.node import NetworkNode
-from app.models.floor import Floor
-from app.api.ocs import get_machine_info
-import pandas as pd
-import io
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from app.services import export, export_jobs
+from app.schemas.export import ExportJobCreate
+from app.core.deps import get_current_user
+import asyncio
+import os
 
 router = APIRouter()
 
+# How often a direct download checks its export job
+DIRECT_POLL_SECONDS = 0.5
+
+async def _direct_export(fmt: str, types: str | None, fields: str | None) -> FileResponse:
+    """
+    The export runs as a job on the bounded export pool (identical exports are reused);
+    the request only waits for it, without holding a worker thread, then sends the file.
+    """
+    columns = export.select_columns(fields)
+    job, _ = await run_in_threadpool(export_jobs.submit, fmt, export.parse_types(types), columns)
+    while job.status in (export_jobs.QUEUED, export_jobs.RUNNING):
+        await asyncio.sleep(DIRECT_POLL_SECONDS)
+    if job.status != export_jobs.DONE:
+        raise HTTPException(status_code=500, detail=f"Export failed: {job.error}")
+    if not job.path or not os.path.exists(job.path):
+        raise HTTPException(status_code=410, detail="Export file expired")
+    return FileResponse(job.path, filename=job.filename, media_type=export.FORMATS[fmt][0])
+
 @router.get("/export/excel")
-def export_nodes_excel(
+async def export_nodes_excel(
     types: str = None, # Comma separated: 'Computador,Ramal'
-    fields: str = None, # Comma separated: 'name,ip_address'
-    db: Session = Depends(get_db),
-    ocs_db: Session = Depends(get_ocs_db)
+    fields: str = None # Comma separated: 'name,ip_address'
 ):
-    # Filter by Types
-    query = db.query(NetworkNode, Floor).outerjoin(Floor, NetworkNode.floor_id == Floor.id)
-    
-    if types:
-        type_list = [t.strip() for t in types.split(',')]
-        query = query.filter(NetworkNode.type.in_(type_list))
-    
-    nodes = query.all()
-    
-    data = []
-    
-    # 2. Process each node
-    for node, floor in nodes:
-        row = {
-            "ID": node.id,
-            "Nome": node.name,
-            "Tipo": node.type,
-            "Andar": floor.name if floor else f"Desconhecido ({node.floor_id})",
-            "Ponto de Rede": node.point_number,
-            "Responsável": node.assigned_to,
-            "Detalhes": node.details,
-            "IP (Netmap)": node.ip_address,
-            # OCS Defaults
-            "OCS IP": None,
-            "OCS Processador": None,
-            "OCS Memória (MB)": None,
-            "OCS Disco (GB)": None,
-            "OCS OS": None,
-            "OCS Usuário": None,
-            "OCS Última Sincronização": None
-        }
-        
-        # 3. Enrich with OCS Data if it's a computer
-        if node.type == 'Computador' and ocs_db:
-            ocs_info = get_machine_info(node.name, ocs_db)
-            if ocs_info:
-                # User Request: Use OCS IP as main IP
-                if ocs_info.get("IPADDR"):
-                    row["IP (Netmap)"] = ocs_info.get("IPADDR")
-                
-                row["OCS IP"] = ocs_info.get("IPADDR")
-                row["OCS Processador"] = ocs_info.get("PROCESSOR")
-                row["OCS Memória (MB)"] = ocs_info.get("MEMORY")
-                
-                # Disk Size in GB
-                disk_mb = ocs_info.get("DISKSIZE")
-                if disk_mb:
-                    try:
-                        row["OCS Disco (GB)"] = round(float(disk_mb) / 1024, 1)
-                    except:
-                        row["OCS Disco (GB)"] = disk_mb
-                
-                row["OCS OS"] = ocs_info.get("OSNAME")
-                row["OCS Usuário"] = ocs_info.get("USERID")
-                row["OCS Última Sincronização"] = ocs_info.get("LASTDATE")
-        
-        data.append(row)
-        
-    # 4. Generate DataFrame
-    df = pd.DataFrame(data)
-    
-    # 5. Filter Columns if requested
-    if fields and not df.empty:
-        # Map Frontend Field names to DataFrame Columns
-        field_map = {
-            "name": "Nome",
-            "type": "Tipo",
-            "floor": "Andar",
-            "point": "Ponto de Rede",
-            "assigned": "Responsável",
-            "details": "Detalhes",
-            "ip": "IP (Netmap)",
-            "ocs_ip": "OCS IP",
-            "ocs_cpu": "OCS Processador",
-            "ocs_ram": "OCS Memória (MB)",
-            "ocs_disk": "OCS Disco (GB)",
-            "ocs_os": "OCS OS",
-            "ocs_user": "OCS Usuário",
-            "ocs_last": "OCS Última Sincronização"
-        }
-        
-        requested_cols = []
-        # Always include ID? Maybe not if user wants clean list.
-        # Let's include ID only if implicit or requested? Let's stick to user request.
-        
-        req_fields = [f.strip() for f in fields.split(',')]
-        for rf in req_fields:
-            if rf in field_map:
-                requested_cols.append(field_map[rf])
-        
-        # Filter DF
-        existing_cols = [c for c in requested_cols if c in df.columns]
-        if existing_cols:
-            df = df[existing_cols]
-    
-    # 5. Create Excel in Memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Inventario')
-        
-    output.seek(0)
-    
-    # 6. Return Streaming Response
-    filename = f"netmap_export_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-    headers = {
-        'Content-Disposition': f'attachment; filename="{filename}"'
-    }
-    
-    return StreamingResponse(
-        output, 
-        headers=headers, 
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    return await _direct_export("xlsx", types, fields)
+
+@router.get("/export/csv")
+async def export_nodes_csv(types: str = None, fields: str = None):
+    return await _direct_export("csv", types, fields)
+
+@router.get("/export/ndjson")
+async def export_nodes_ndjson(types: str = None, fields: str = None):
+    return await _direct_export("ndjson", types, fields)
+
+@router.post("/export/jobs", status_code=202)
+def create_export_job(payload: ExportJobCreate, response: Response, current_user = Depends(get_current_user)):
+    """
+    Queues an export on the bounded export pool (progress via GET /export/jobs/{id} or
+    'export' events on /api/events). An identical export with unchanged data is reused.
+    """
+    columns = export.select_columns(",".join(payload.fields)) if payload.fields else list(export.COLUMNS)
+    job, reused = export_jobs.submit(payload.format, payload.types or None, columns)
+    response.headers["Location"] = f"/api/export/jobs/{job.id}"
+    return {**job.to_dict(), "reused": reused}
+
+@router.get("/export/jobs/{job_id}")
+def get_export_job(job_id: str, current_user = Depends(get_current_user)):
+    job = export_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    return job.to_dict()
+
+@router.get("/export/jobs/{job_id}/download")
+def download_export_job(job_id: str, current_user = Depends(get_current_user)):
+    job = export_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    if job.status != export_jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    if not job.path or not os.path.exists(job.path):
+        raise HTTPException(status_code=410, detail="Export file expired")
+
+    return FileResponse(job.path, filename=job.filename, media_type=export.FORMATS[job.fmt][0])
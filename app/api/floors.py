@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
 from sqlalchemy.orm import Session
 from app.database import get_db, Base, engine
 from app.models.floor import Floor
 from app.models.node import NetworkNode
 from app.core.deps import get_current_editor_user
-import shutil
+from app.core.etag import make_etag, is_not_modified, not_modified, set_etag
+from app.services import versions, changes, tiles, clusters, inventory, floor_images, floor_pipeline
+from app.services.events import hub
 import os
-from PIL import Image
 
 router = APIRouter()
 
@@ -18,8 +19,52 @@ if not os.path.exists(STATIC_FLOORS_DIR):
 # Tables initialized in main.py
 
 @router.get("/floors")
-def get_floors(db: Session = Depends(get_db)):
-    return db.query(Floor).order_by(Floor.level_order).all()
+def get_floors(request: Request, response: Response, db: Session = Depends(get_db)):
+    etag = make_etag(versions.FLOORS, versions.current(db, versions.FLOORS))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+    # Derivatives (WebP, thumbnail, scaled sizes) let the browser pick the smallest suitable asset
+    variants = floor_pipeline.variants_by_floor(db)
+    return [
+        {**floor.to_dict(), "variants": variants.get(floor.id, {})}
+        for floor in db.query(Floor).order_by(Floor.level_order).all()
+    ]
+
+@router.get("/floors/{floor_id}/tiles/{z}/{x}/{y}.mvt")
+def get_floor_tile(floor_id: int, z: int, x: int, y: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Vector tile (Mapbox Vector Tile) of the floor's nodes, in the floor's pixel space (L.CRS.Simple).
+    """
+    floor = db.query(Floor).filter(Floor.id == floor_id).first()
+    if not floor:
+        raise HTTPException(status_code=404, detail="Floor not found")
+
+    etag = make_etag("tile", floor_id, z, x, y, versions.current(db, versions.NODES))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    response = Response(content=tiles.get_floor_tile(db, floor, z, x, y), media_type="application/vnd.mapbox-vector-tile")
+    set_etag(response, etag)
+    return response
+
+@router.get("/floors/{floor_id}/clusters")
+def get_floor_clusters(
+    floor_id: int,
+    zoom: float = Query(..., ge=-8, le=8),
+    status: bool = False, # Also count computers per status color (queries OCS)
+    db: Session = Depends(get_db)
+):
+    """
+    Server-side clusters for zoomed-out views: one entry per grid cell instead of one per node.
+    """
+    floor = db.query(Floor).filter(Floor.id == floor_id).first()
+    if not floor:
+        raise HTTPException(status_code=404, detail="Floor not found")
+
+    status_map = inventory.get_cached_status_map()[0] if status else None
+    return clusters.get_floor_clusters(db, floor_id, zoom, status_map)
 
 @router.post("/floors/upload")
 async def upload_floor(
@@ -29,26 +74,26 @@ async def upload_floor(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_editor_user)
 ):
-    # Save file
-    file_path = os.path.join(STATIC_FLOORS_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Analyze Image
-    with Image.open(file_path) as img:
-        width, height = img.size
+    # Save file (streamed, content-addressed) and read its size from the header
+    try:
+        stored = await floor_images.save_upload(file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Create DB Entry
     new_floor = Floor(
         name=name,
         level_order=level_order,
-        image_path=f"/static/assets/floors/{file.filename}",
-        width=width,
-        height=height
+        image_path=stored["image_path"],
+        width=stored["width"],
+        height=stored["height"]
     )
     db.add(new_floor)
+    versions.bump(db, versions.FLOORS)
     db.commit()
     db.refresh(new_floor)
+    # Tiles and variants are built in the background; the plain image is usable meanwhile
+    floor_pipeline.schedule(new_floor.id, new_floor.image_path)
     return new_floor
 
 @router.patch("/floors/{floor_id}")
@@ -62,6 +107,7 @@ def update_floor(floor_id: int, name: str = None, level_order: int = None, db: S
     if level_order is not None:
         floor.level_order = level_order
         
+    versions.bump(db, versions.FLOORS)
     db.commit()
     return floor
 
@@ -77,27 +123,18 @@ def delete_floor(floor_id: int, db: Session = Depends(get_db), current_user = De
     # We should keep existing logic if any, but currently the code just deletes.
     # We will just add the file deletion logic here.
     
-    # 1. Resolve absolute file path
-    # db stores: /static/assets/floors/filename.ext
-    if floor.image_path:
-        # Strip leading slash if present to join correctly
-        relative_path = floor.image_path.lstrip("/")
-        # Current working dir is usually the root project dir (where Dockerfile is)
-        # static dir is at ./static
-        full_path = os.path.abspath(relative_path)
-        
-        # Verify it is inside our static directory for safety
-        if os.path.exists(full_path):
-            try:
-                os.remove(full_path)
-                print(f"INFO: Deleted floor image file: {full_path}")
-            except Exception as e:
-                print(f"ERROR: Failed to delete image file {full_path}: {e}")
-        else:
-            print(f"WARNING: Image file not found at {full_path}, skipping filesystem deletion.")
+    # 1. Remove the image file (unless another floor shares the same content)
+    floor_pipeline.delete_image_if_unused(db, floor.image_path, floor_id)
+    floor_pipeline.delete_image_if_unused(db, floor.pending_image_path, floor_id)
+
+    floor_images.remove_old_pyramids(floor_id)
 
     # 2. CASCADE DELETE: Remove all nodes on this floor first to avoid FK Constraint Error
+    node_ids = []
     try:
+        # Tombstones for the change feed, written in the same transaction as the delete
+        node_ids = [row[0] for row in db.query(NetworkNode.id).filter(NetworkNode.floor_id == floor_id)]
+        changes.record(db, changes.DELETE, [(node_id, floor_id) for node_id in node_ids])
         nodes_deleted = db.query(NetworkNode).filter(NetworkNode.floor_id == floor_id).delete()
         print(f"INFO: Cascade deleted {nodes_deleted} nodes for floor {floor_id}")
     except Exception as e:
@@ -105,7 +142,10 @@ def delete_floor(floor_id: int, db: Session = Depends(get_db), current_user = De
         # We might want to raise here, but usually we try to proceed or the next step fails anyway
         
     db.delete(floor)
+    versions.bump(db, versions.FLOORS)
     db.commit()
+    if node_ids:
+        hub.publish("nodes", {"op": changes.DELETE, "ids": node_ids})
     return {"status": "deleted", "id": floor_id}
 
 @router.post("/floors/{floor_id}/image")
@@ -118,34 +158,27 @@ async def update_floor_image(
     if not floor:
         raise HTTPException(status_code=404, detail="Floor not found")
 
-    # Delete OLD file if exists
-    if floor.image_path:
-        try:
-            # Construct absolute path from relative DB path
-            # DB: /static/assets/floors/image.jpg
-            # FS: static/assets/floors/image.jpg
-            old_relative = floor.image_path.lstrip("/")
-            old_path = os.path.abspath(old_relative)
-            if os.path.exists(old_path):
-                os.remove(old_path)
-                print(f"INFO: Deleted old floor image: {old_path}")
-        except Exception as e:
-            print(f"WARNING: Failed to delete old image {old_path}: {e}")
-
-    # Save new file
-    file_path = os.path.join(STATIC_FLOORS_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Analyze Image
-    with Image.open(file_path) as img:
-        width, height = img.size
+    # Save new file (streamed, content-addressed)
+    try:
+        stored = await floor_images.save_upload(file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Update Stats
-    floor.image_path = f"/static/assets/floors/{file.filename}"
-    floor.width = width
-    floor.height = height
+    # The floor keeps showing its current image, size and derivatives: the new image is
+    # pending until the job swaps it in together with its own derivatives (one commit)
+    previous_pending = floor.pending_image_path
+    if stored["image_path"] == floor.image_path:
+        floor.pending_image_path = floor.pending_width = floor.pending_height = None
+    else:
+        floor.pending_image_path = stored["image_path"]
+        floor.pending_width = stored["width"]
+        floor.pending_height = stored["height"]
     
+    versions.bump(db, versions.FLOORS)
     db.commit()
     db.refresh(floor)
+    if floor.pending_image_path:
+        floor_pipeline.schedule(floor.id, floor.pending_image_path)
+    if previous_pending and previous_pending not in (floor.pending_image_path, floor.image_path):
+        floor_pipeline.delete_image_if_unused(db, previous_pending, floor.id)
     return floor
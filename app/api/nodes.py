@@ -1,51 +1,107 @@
-from fastapi import APIRouter, Depends
+import base64
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from app.database import get_db, Base, engine
 from app.models.node import NetworkNode
+from app.repository.node_repository import NodeRepository
+from sqlalchemy.exc import SQLAlchemyError
+from app.services import versions, changes, node_bulk, inventory
+from app.services.events import hub
+from app.core.etag import make_etag, is_not_modified, not_modified, set_etag
 
 router = APIRouter()
 
 # Tables initialized in main.py
 
+SEARCH_MAX_LIMIT = 200
+
+def parse_bbox(bbox: str | None):
+    """
+    Parses 'min_x,min_y,max_x,max_y' (map units, same space as node x/y).
+    """
+    if not bbox:
+        return None
+    try:
+        min_x, min_y, max_x, max_y = [float(v) for v in bbox.split(',')]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'min_x,min_y,max_x,max_y'")
+    if min_x > max_x or min_y > max_y:
+        raise HTTPException(status_code=400, detail="bbox min values must not exceed max values")
+    return (min_x, min_y, max_x, max_y)
+
+def parse_types(types: str | None):
+    # Comma separated: 'Computador,Ramal'
+    if not types:
+        return None
+    return [t.strip() for t in types.split(',') if t.strip()]
+
 @router.get("/nodes")
-def get_nodes(db: Session = Depends(get_db)):
-    nodes = db.query(NetworkNode).all()
-    
-    features = [node.to_geojson() for node in nodes]
-    
-    return {
-        "type": "FeatureCollection",
-        "features": features
-    }
+def get_nodes(
+    request: Request,
+    floor_id: int = None,
+    bbox: str = None, # 'min_x,min_y,max_x,max_y'
+    types: str = None, # Comma separated: 'Computador,Ramal'
+    db: Session = Depends(get_db)
+):
+    # The ETag only depends on the nodes version: the filters are part of the URL,
+    # and the browser keeps one cached copy (and one ETag) per URL.
+    etag = make_etag(versions.NODES, versions.current(db, versions.NODES))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    # Read before the data: changes racing with this request are re-sent by the feed.
+    cursor = changes.current_cursor(db)
+
+    query = NodeRepository.filtered_query(db, floor_id, parse_bbox(bbox), parse_types(types))
+    # PostGIS builds the FeatureCollection; we only forward the bytes.
+    response = Response(content=NodeRepository.feature_collection_json(db, query), media_type="application/json")
+    response.headers["X-Changes-Cursor"] = str(cursor)
+    set_etag(response, etag)
+    return response
+
+@router.get("/nodes/changes")
+def get_node_changes(since: int = 0, floor_id: int = None, db: Session = Depends(get_db)):
+    """
+    Incremental feed: nodes inserted/updated/deleted after the `since` cursor.
+    Start from the X-Changes-Cursor header of GET /api/nodes, then pass the
+    returned `cursor` back on the next call. `reset: true` means reload everything.
+    """
+    return Response(content=changes.get_changes(db, since, floor_id), media_type="application/json")
+
+def encode_search_cursor(key: tuple[int, float, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_search_cursor(cursor: str | None):
+    if not cursor:
+        return None
+    try:
+        exact, score, node_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (int(exact), float(score), int(node_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid search cursor")
 
 @router.get("/search")
-def search_nodes(q: str, db: Session = Depends(get_db)):
+def search_nodes(
+    q: str,
+    limit: int = Query(30, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: str = None, # X-Next-Cursor of the previous page
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked search: exact point_number first, then trigram similarity.
+    The body stays a plain list of features; the next page cursor is sent in X-Next-Cursor.
+    """
+    q = q.strip()
     if not q:
         return []
-    term = f"%{q}%"
-    nodes = db.query(NetworkNode).filter(
-        or_(
-            NetworkNode.name.ilike(term),
-            NetworkNode.assigned_to.ilike(term),
-            NetworkNode.point_number.ilike(term)
-        )
-    ).limit(30).all()
-    return [node.to_geojson() for node in nodes]
-
-from pydantic import BaseModel
-
-class NodeCreate(BaseModel):
-    name: str
-    type: str # 'Computador', 'Ponto', 'Ramal'
-    ip_address: str | None = None
-    point_number: str | None = None
-    assigned_to: str | None = None
-    details: str | None = None
-    floor_id: int
-    x: float
-    y: float
+    features, last_key = NodeRepository.search(db, q, limit, decode_search_cursor(cursor))
+    response = Response(content=features, media_type="application/json")
+    if last_key is not None:
+        response.headers["X-Next-Cursor"] = encode_search_cursor(last_key)
+    return response
 
+from app.schemas.node import NodeCreate, NodeUpdate, NodeBulkRequest
 from app.core.deps import get_current_editor_user
 
 @router.post("/nodes")
@@ -67,11 +123,49 @@ def create_node(node: NodeCreate, db: Session = Depends(get_db), current_user =
     
     
     db.add(new_node)
+    db.flush() # Assigns new_node.id for the change log
+    changes.record(db, changes.INSERT, [(new_node.id, new_node.floor_id)])
     db.commit()
     db.refresh(new_node)
+    if new_node.type == 'Computador':
+        inventory.invalidate_status() # New computer needs its status color
+    hub.publish("nodes", {"op": changes.INSERT, "ids": [new_node.id]})
     return new_node.to_geojson()
 
-from fastapi import HTTPException
+def _run_batch(db: Session, create_rows: list[dict], update_rows: list[dict], delete_ids: list[int]):
+    try:
+        result = node_bulk.apply_batch(db, create_rows, update_rows, delete_ids)
+    except SQLAlchemyError as e:
+        print(f"ERROR: Bulk node batch rolled back: {e}")
+        raise HTTPException(status_code=400, detail=f"Batch rolled back: {getattr(e, 'orig', e)}")
+
+    ids = [r["id"] for r in result["results"] if r["status"] != "error"]
+    if result["counts"]["created"] or result["counts"]["updated"] or result["counts"]["deleted"]:
+        inventory.invalidate_status() # Computers may have been added, renamed or removed
+    if ids:
+        hub.publish("nodes", {"op": "bulk", "ids": ids})
+    return result
+
+@router.post("/nodes/bulk")
+def bulk_nodes(batch: NodeBulkRequest, db: Session = Depends(get_db), current_user = Depends(get_current_editor_user)):
+    """
+    Creates, updates and deletes many nodes in one transaction.
+    Body: {"create": [NodeCreate...], "update": [{"id": 1, ...NodeUpdate}], "delete": [ids]}
+    """
+    return _run_batch(db, batch.create, batch.update, batch.delete)
+
+@router.post("/nodes/import")
+def import_nodes(file: UploadFile = File(...), db: Session = Depends(get_db), current_user = Depends(get_current_editor_user)):
+    """
+    Creates nodes from a CSV or XLSX file whose header row uses the NodeCreate
+    field names (name, type, floor_id, x, y, ...), in one transaction.
+    """
+    try:
+        rows = node_bulk.parse_upload(file.filename, file.file.read())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return _run_batch(db, rows, [], [])
 
 @router.delete("/nodes/{node_id}")
 def delete_node(node_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_editor_user)):
@@ -79,26 +173,24 @@ def delete_node(node_id: int, db: Session = Depends(get_db), current_user = Depe
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     
+    was_computer = node.type == 'Computador'
     db.delete(node)
+    changes.record(db, changes.DELETE, [(node.id, node.floor_id)])
     db.commit()
+    if was_computer:
+        inventory.invalidate_status() # Drop its status color
+    hub.publish("nodes", {"op": changes.DELETE, "ids": [node_id]})
     return {"status": "deleted", "id": node_id}
 
-class NodeUpdate(BaseModel):
-    name: str | None = None
-    type: str | None = None
-    point_number: str | None = None
-    assigned_to: str | None = None
-    details: str | None = None
-    floor_id: int | None = None
-    x: float | None = None
-    y: float | None = None
-
 @router.put("/nodes/{node_id}")
 def update_node(node_id: int, node_update: NodeUpdate, db: Session = Depends(get_db), current_user = Depends(get_current_editor_user)):
     node = db.query(NetworkNode).filter(NetworkNode.id == node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     
+    previous_floor_id = node.floor_id
+    previous_identity = (node.name, node.type)
+    
     if node_update.name is not None:
         node.name = node_update.name
     if node_update.type is not None:
@@ -116,5 +208,15 @@ def update_node(node_id: int, node_update: NodeUpdate, db: Session = Depends(get
     if node_update.x is not None and node_update.y is not None:
         node.geom = f"POINT({node_update.x} {node_update.y})"
         
+    # A node moved to another floor is also logged on the old floor,
+    # so clients following that floor see it leave.
+    touched = [(node.id, node.floor_id)]
+    if previous_floor_id != node.floor_id:
+        touched.append((node.id, previous_floor_id))
+    changes.record(db, changes.UPDATE, touched)
     db.commit()
+    # Status is matched by computer name
+    if (node.name, node.type) != previous_identity and 'Computador' in (node.type, previous_identity[1]):
+        inventory.invalidate_status()
+    hub.publish("nodes", {"op": changes.UPDATE, "ids": [node_id]})
     return node.to_geojson()
@@ -1,27 +1,230 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.database import get_ocs_db
-from app.services import ocs
+from app.database import get_db, get_ocs_db
+from app.models.node import NetworkNode
+from app.services import ocs, ocs_mirror, inventory, bindings
+from app.schemas.ocs import OcsMachinesRequest, OcsBindingUpdate
+from app.models.node_ocs_binding import NodeOcsBinding
 
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_current_editor_user
 
 router = APIRouter()
 
 @router.get("/ocs/machine/{hostname}")
-def get_machine_info(hostname: str, db: Session = Depends(get_ocs_db), current_user = Depends(get_current_user)):
-    if db is None:
+def get_machine_info(
+    hostname: str,
+    response: Response,
+    db: Session = Depends(get_ocs_db),
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    machine, hit = ocs.get_machine_cached(db, hostname, local_db=local_db)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    if machine:
+        return machine
+
+    if db is None and not ocs_mirror.is_fresh(local_db):
         raise HTTPException(status_code=503, detail="OCS Database not available")
-    
-    machine = ocs.get_machine_by_name(db, hostname)
-    if not machine:
-        raise HTTPException(status_code=404, detail="Machine not found in OCS")
-    
-    return machine
+    raise HTTPException(status_code=404, detail="Machine not found in OCS")
+
+# Hostnames accepted per POST /ocs/machines request
+MAX_BATCH_HOSTNAMES = 5000
+
+@router.post("/ocs/machines")
+def get_machines_info(
+    payload: OcsMachinesRequest,
+    response: Response,
+    db: Session = Depends(get_ocs_db),
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Details of many machines in one response: the given hostnames, or every computer
+    of floor_id. Cached machines come from the machine details cache, the rest from
+    one batched lookup (set-based queries per 500 names) that also fills the cache.
+    """
+    if payload.floor_id is not None:
+        names = [row[0] for row in local_db.query(NetworkNode.name).filter(
+            NetworkNode.floor_id == payload.floor_id, NetworkNode.type == 'Computador'
+        )]
+        names += payload.hostnames or []
+    elif payload.hostnames is not None:
+        names = payload.hostnames
+    else:
+        raise HTTPException(status_code=400, detail="Provide hostnames or floor_id")
+    if len(names) > MAX_BATCH_HOSTNAMES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_HOSTNAMES} hostnames per request")
+
+    machines, hits = ocs.get_machines_cached(db, names, local_db=local_db)
+    if not machines and db is None and not ocs_mirror.is_fresh(local_db):
+        raise HTTPException(status_code=503, detail="OCS Database not available")
+
+    result = {}
+    not_found = {}
+    for name in names:
+        if not name or name in result or name in not_found:
+            continue
+        machine = machines.get(name.upper())
+        if machine:
+            result[name] = machine
+        else:
+            not_found[name] = None
+    response.headers["X-Cache-Hits"] = str(hits)
+    return {"machines": result, "not_found": list(not_found)}
+
+@router.post("/ocs/prefetch", status_code=202)
+def prefetch_floor_machines(
+    floor_id: int,
+    background_tasks: BackgroundTasks,
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Warms the machine details cache for every computer of a floor in the background
+    (one batched lookup), so detail popovers open without an OCS round trip.
+    """
+    names = [row[0] for row in local_db.query(NetworkNode.name).filter(
+        NetworkNode.floor_id == floor_id, NetworkNode.type == 'Computador'
+    )]
+    missing = [name for name in names if name.upper() not in ocs.machine_cache]
+    if missing:
+        background_tasks.add_task(ocs.prefetch_machines, missing)
+    return {"floor_id": floor_id, "computers": len(names), "queued": len(missing)}
+
+@router.get("/ocs/cache/stats")
+def get_cache_stats(current_user = Depends(get_current_user)):
+    """
+    Hit/miss/eviction counters of the machine details and status caches.
+    """
+    return {
+        "machines": ocs.machine_cache.stats(),
+        "status": inventory.status_cache.stats()
+    }
 
 @router.get("/ocs/software/search")
-def search_software(q: str, db: Session = Depends(get_ocs_db), current_user = Depends(get_current_user)):
-    if db is None:
+def search_software(
+    q: str,
+    prefix: bool = False,
+    limit: int = Query(ocs.SOFTWARE_PAGE_SIZE, ge=1, le=500),
+    hostnames: int = Query(ocs.SOFTWARE_GROUP_HOSTNAMES, ge=0, le=ocs.SOFTWARE_GROUP_HOSTNAMES_MAX),
+    cursor: str | None = None,
+    db: Session = Depends(get_ocs_db),
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Machines by software, grouped by software and version. Pass next_cursor back as
+    cursor for the next page; prefix=true matches names starting with q.
+    Each group lists up to `hostnames` hostnames, `machines` counts them all.
+    """
+    if db is None and not ocs_mirror.is_fresh(local_db):
         raise HTTPException(status_code=503, detail="OCS Database not available")
-    
-    # Return list of hostnames
-    return ocs.search_machines_by_software(db, q)
+    try:
+        after = ocs.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ocs.search_software(db, q, prefix=prefix, after=after, limit=limit, local_db=local_db, hostnames_limit=hostnames)
+
+@router.get("/ocs/bindings")
+def list_bindings(
+    confirmed: bool | None = None,
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Node <-> OCS machine bindings (confirmed=false lists the ones the audit proposed).
+    """
+    query = (
+        local_db.query(NodeOcsBinding, NetworkNode.name)
+        .join(NetworkNode, NetworkNode.id == NodeOcsBinding.node_id)
+        .order_by(NetworkNode.name)
+    )
+    if confirmed is not None:
+        query = query.filter(NodeOcsBinding.confirmed == confirmed)
+    return [{**binding.to_dict(), "name": name} for binding, name in query]
+
+@router.put("/ocs/bindings/{node_id}")
+def update_binding(
+    node_id: int,
+    payload: OcsBindingUpdate,
+    db: Session = Depends(get_ocs_db),
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_editor_user)
+):
+    """
+    Binds a computer to an OCS machine (hardware_id) or, without hardware_id, confirms the
+    binding proposed by the audit. Lookups for the node then go by hardware id.
+    """
+    node = local_db.get(NetworkNode, node_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+
+    hardware_id = payload.hardware_id
+    if hardware_id is None:
+        current = local_db.get(NodeOcsBinding, node_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Node has no OCS binding to confirm")
+        hardware_id = current.hardware_id
+
+    machine = ocs.get_machine_by_id(db, hardware_id, local_db=local_db)
+    if machine is None:
+        if db is None and not ocs_mirror.is_fresh(local_db):
+            raise HTTPException(status_code=503, detail="OCS Database not available")
+        raise HTTPException(status_code=404, detail="Machine not found in OCS")
+
+    binding = bindings.set_binding(local_db, node_id, hardware_id, machine["NAME"], current_user.username)
+    local_db.commit()
+    local_db.refresh(binding)
+    ocs.machine_cache.invalidate(node.name.upper())
+    inventory.invalidate_status()
+    return binding.to_dict()
+
+@router.delete("/ocs/bindings/{node_id}")
+def delete_binding(
+    node_id: int,
+    local_db: Session = Depends(get_db),
+    current_user = Depends(get_current_editor_user)
+):
+    binding = local_db.get(NodeOcsBinding, node_id)
+    if not binding:
+        raise HTTPException(status_code=404, detail="Binding not found")
+    node = local_db.get(NetworkNode, node_id)
+    local_db.delete(binding)
+    local_db.commit()
+    if node:
+        ocs.machine_cache.invalidate(node.name.upper())
+    inventory.invalidate_status()
+    return {"status": "deleted", "node_id": node_id}
+
+@router.get("/ocs/mirror")
+def get_mirror_state(local_db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    State of the local OCS mirror (last sync, watermark, whether reads use it).
+    """
+    state = ocs_mirror.get_state(local_db)
+    return {
+        "fresh": ocs_mirror.is_fresh(local_db),
+        "max_age_seconds": ocs_mirror.MAX_AGE,
+        "sync_interval_seconds": ocs_mirror.SYNC_INTERVAL,
+        "last_sync_at": state.last_sync_at if state else None,
+        "last_full_sync_at": state.last_full_sync_at if state else None,
+        "watermark": state.watermark if state else None,
+        "machines": state.machines if state else None,
+        "last_error": state.last_error if state else None
+    }
+
+@router.post("/ocs/mirror/sync")
+async def sync_mirror(full: bool = False, current_user = Depends(get_current_editor_user)):
+    """
+    Runs a mirror sync now (full=true copies everything again).
+    """
+    result = await run_in_threadpool(ocs_mirror.sync, full)
+    if result["status"] == "disabled":
+        raise HTTPException(status_code=503, detail="OCS Database not configured")
+    if result["status"] == "unavailable":
+        raise HTTPException(status_code=503, detail="OCS Database unavailable (circuit breaker open)")
+    if result["status"] == "running":
+        raise HTTPException(status_code=409, detail="A mirror sync is already running")
+    return result
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional TTL (seconds).
+    Sync endpoints run in FastAPI's threadpool, hence the lock.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=_MISSING):
+        """
+        Drops one key, or everything when called without arguments.
+        """
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        """
+        Membership test that does not count as a hit/miss nor refresh the LRU order.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and (entry[0] is None or entry[0] > time.monotonic())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+class _Flight:
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.done = threading.Event()
+        self.value = _MISSING
+        self.error = None
+
+class SingleFlightCache:
+    """
+    One shared value produced by `loader()`.
+    Fresh for `ttl` seconds, then served stale for up to `stale_ttl` more while a single
+    background refresh runs (stale-while-revalidate). Concurrent callers that find no
+    usable value wait for the same load instead of each running it (request coalescing).
+    """
+
+    def __init__(self, loader, ttl: float, stale_ttl: float = 0, name: str = "cache"):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._value = _MISSING
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._inflight: _Flight | None = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+
+    def get(self) -> tuple:
+        """
+        Returns (value, age in seconds). Raises the loader's error if there is nothing to serve.
+        """
+        with self._lock:
+            if self._value is not _MISSING:
+                age = time.monotonic() - self._loaded_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return self._value, age
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    if self._inflight is None:
+                        flight = self._inflight = _Flight(self._generation)
+                        threading.Thread(target=self._load, args=(flight,), daemon=True, name=f"{self.name}-refresh").start()
+                    return self._value, age
+
+            self.misses += 1
+            flight = self._inflight
+            owner = flight is None
+            if owner:
+                flight = self._inflight = _Flight(self._generation)
+            else:
+                self.coalesced += 1
+
+        if owner:
+            self._load(flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, 0.0
+
+    def _load(self, flight: _Flight):
+        try:
+            flight.value = self.loader()
+        except Exception as e:
+            print(f"ERROR: {self.name} refresh failed: {e}")
+            flight.error = e
+        with self._lock:
+            self.loads += 1
+            # Results started before an invalidate() are handed to their waiters but not kept
+            if flight.error is None and flight.generation == self._generation:
+                self._value = flight.value
+                self._loaded_at = time.monotonic()
+            if self._inflight is flight:
+                self._inflight = None
+        flight.done.set()
+
+    def invalidate(self):
+        """
+        Drops the value; the next get() loads it again (a load already running is not reused).
+        """
+        with self._lock:
+            self._generation += 1
+            self._value = _MISSING
+            self._inflight = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "age": round(time.monotonic() - self._loaded_at, 1) if self._value is not _MISSING else None,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "loads": self.loads
+            }
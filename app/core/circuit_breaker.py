@@ -0,0 +1,89 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a dependency whose circuit breaker is open.
+    """
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker around an unreliable dependency (the OCS tunnel).
+
+    closed:    calls go through; `failure_threshold` consecutive failures open it.
+    open:      calls are refused at once; after `reset_timeout` seconds one trial is allowed.
+    half_open: a single trial (a request or the background probe) is in flight;
+               its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self.last_error = None
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        True when the call may go ahead (closed, or this call is the half-open trial).
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+                self._trial_started = now
+                return True
+            # A trial that never reported back (e.g. the session was not used) is retried
+            if self._state == HALF_OPEN and now - self._trial_started >= self.reset_timeout:
+                self._trial_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, error: Exception | None = None):
+        with self._lock:
+            self._failures += 1
+            self.last_error = str(error) if error else None
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def _transition(self, state: str):
+        # Called with the lock held
+        if state == OPEN:
+            print(f"WARNING: {self.name} circuit breaker opened after {self._failures} failure(s): {self.last_error}")
+        elif state == CLOSED:
+            print(f"INFO: {self.name} circuit breaker closed.")
+        self._state = state
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "failures": self._failures,
+                "retry_in": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1) if self._state == OPEN else None,
+                "last_error": self.last_error,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,170 @@
+import gzip
+import re
+import stat
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+
+try:
+    import brotli
+except ImportError: # Brotli is optional, gzip is always available
+    brotli = None
+
+MINIMUM_SIZE = 500 # Bytes; smaller bodies are not worth the CPU
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4 # Dynamic responses: fast levels. Static assets are precompressed at max level.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/geo+json",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.mapbox-vector-tile",
+    "image/svg+xml",
+    "text/",
+)
+
+def accepted_encodings(header: str | None) -> set[str]:
+    """
+    Content codings the client accepts (q > 0) from an Accept-Encoding header.
+    """
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+def choose_encoding(header: str | None) -> str | None:
+    accepted = accepted_encodings(header)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """
+    gzip/brotli negotiation for complete (single message) responses.
+    Streamed bodies (SSE, file downloads, exports) pass through untouched,
+    so event streams are never buffered.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            compressible = (
+                not message.get("more_body", False)
+                and start_message["status"] == 200
+                and "content-encoding" not in headers
+                and len(body) >= self.minimum_size
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if not compressible:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            # A strong ETag identifies one representation: tag the encoded one
+            # (etag.is_not_modified strips the suffix again).
+            etag = headers.get("etag")
+            if etag and etag.endswith('"'):
+                headers["ETag"] = etag[:-1] + ("-br" if encoding == "br" else "-gz") + '"'
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Serves `file.br` / `file.gz` next to `file` when present and accepted
+    (generated by scripts/precompress_static.py).
+    Paths matching `immutable_pattern` never change content and are cached for a year.
+    """
+
+    def __init__(self, *args, immutable_pattern: str | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable_pattern = re.compile(immutable_pattern) if immutable_pattern else None
+
+    async def get_response(self, path: str, scope):
+        response = await self._negotiate(path, scope)
+        if self.immutable_pattern and self.immutable_pattern.match(path.replace("\\", "/")):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    async def _negotiate(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code != 200 or not isinstance(response, FileResponse):
+            return response
+
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            # Skip stale variants (original edited after precompressing)
+            original = getattr(response, "stat_result", None)
+            if original is not None and stat_result.st_mtime < original.st_mtime:
+                continue
+            compressed = FileResponse(full_path, stat_result=stat_result, media_type=response.media_type)
+            compressed.headers["Content-Encoding"] = encoding
+            compressed.headers.add_vary_header("Accept-Encoding")
+            if self.is_not_modified(compressed.headers, Headers(scope=scope)):
+                return NotModifiedResponse(compressed.headers)
+            return compressed
+
+        return response
@@ -0,0 +1,44 @@
+import hashlib
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from version parts, e.g. make_etag("nodes", 42) -> '"nodes-42"'.
+    """
+    return '"' + "-".join(str(p) for p in parts) + '"'
+
+def content_etag(body: bytes) -> str:
+    """
+    Strong ETag from the response body, for data without a version counter.
+    """
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    True if the client's If-None-Match already contains this ETag.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2). CompressionMiddleware
+    # tags encoded representations with -br/-gz, the underlying version is the same.
+    candidates = []
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in ('-br"', '-gz"'):
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+        candidates.append(tag)
+    return etag in candidates
+
+def set_etag(response: Response, etag: str):
+    # no-cache: the browser keeps the copy but revalidates it on every request
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
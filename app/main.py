@@ -1,10 +1,11 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.compression import CompressionMiddleware, PrecompressedStaticFiles
 import os
 
-app = FastAPI(title="Netmap v2")
+# orjson for every dict/list returned by the routers
+app = FastAPI(title="Netmap v2", default_response_class=ORJSONResponse)
 
 # CORS Configuration
 origins = ["*"]  # In production, specify domains (e.g., ["http://localhost", "https://mysite.com"])
@@ -17,10 +18,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli negotiation (streamed responses such as /api/events are left as-is)
+app.add_middleware(CompressionMiddleware)
+
 # Database Initialization (Centralized)
 from app.database import engine, Base
 # Import all models to ensure they are registered with Base.metadata
-from app.models import user, floor, node
+from app.models import user, floor, node, data_version, node_change, floor_image_variant, ocs_mirror, node_ocs_binding
 Base.metadata.create_all(bind=engine)
 
 # Mount static files
@@ -28,9 +32,12 @@ static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
 if not os.path.exists(static_dir):
     os.makedirs(static_dir)
 
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+# Serves the .br/.gz files from scripts/precompress_static.py when the browser accepts them
+# Floor tile pyramids live in never reused /assets/floors/<id>/<token>/ directories
+static_files = PrecompressedStaticFiles(directory=static_dir, immutable_pattern=r"assets/floors/(\d+/[0-9a-f]{12}/|[0-9a-f]{64}\.)")
+app.mount("/static", static_files, name="static")
 
-from app.api import nodes, diagnostics, floors, ocs, audit, auth, export, users
+from app.api import nodes, diagnostics, floors, ocs, audit, auth, export, users, events
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
@@ -40,10 +47,51 @@ app.include_router(diagnostics.router, prefix="/api")
 app.include_router(ocs.router, prefix="/api")
 app.include_router(audit.router, prefix="/api")
 app.include_router(export.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+
+import asyncio
+from app.services.events import hub, run_monitors
+
+@app.on_event("startup")
+async def start_event_monitors():
+    # Shared status/health monitors feeding /api/events
+    hub.bind(asyncio.get_running_loop())
+    asyncio.create_task(run_monitors())
+
+from app.services import floor_pipeline, export_jobs, health, fetch_pool
+from app.services.ocs_mirror import run_sync_loop
+from app.services.changes import run_prune_loop
+
+@app.on_event("startup")
+def start_floor_pipeline():
+    # Backfill floors without tiles/variants (older floors, jobs lost on restart)
+    floor_pipeline.schedule_missing()
+
+@app.on_event("startup")
+async def start_ocs_mirror():
+    # Incremental copy of OCS into Postgres (audit/status/machine details read it while fresh)
+    asyncio.create_task(run_sync_loop())
+
+@app.on_event("startup")
+async def start_change_pruning():
+    # node_changes retention (clients with older cursors get reset: true)
+    asyncio.create_task(run_prune_loop())
+
+@app.on_event("startup")
+async def start_ocs_probe():
+    # Closes the OCS circuit breaker again as soon as the tunnel is back
+    asyncio.create_task(health.run_ocs_probe())
+
+@app.on_event("shutdown")
+def stop_worker_pools():
+    floor_pipeline.shutdown()
+    export_jobs.shutdown()
+    fetch_pool.shutdown()
 
 @app.get("/")
-async def read_root():
-    return FileResponse(os.path.join(static_dir, "index.html"))
+async def read_root(request: Request):
+    # Same handler as /static so index.html.br / .gz are used too
+    return await static_files.get_response("index.html", request.scope)
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, String, BigInteger
+from app.database import Base
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True) # Dataset: 'nodes', 'floors'
+    version = Column(BigInteger, nullable=False, default=0) # Bumped on every write to the dataset
@@ -10,3 +10,24 @@ class Floor(Base):
     image_path = Column(String, nullable=False)  # Relative path like /static/assets/floors/file.jpg
     width = Column(Integer, default=2000)
     height = Column(Integer, default=1500)
+    tiles_path = Column(String, nullable=True) # XYZ template /static/assets/floors/<id>/<token>/{z}/{x}/{y}.webp
+    preview_path = Column(String, nullable=True) # Small preview shown while tiles load
+    tile_min_zoom = Column(Integer, nullable=True) # Lowest zoom level rendered (highest is 0 = native)
+    # Replacement image waiting for its derivatives; swapped in with them in one commit
+    pending_image_path = Column(String, nullable=True)
+    pending_width = Column(Integer, nullable=True)
+    pending_height = Column(Integer, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "level_order": self.level_order,
+            "image_path": self.image_path,
+            "width": self.width,
+            "height": self.height,
+            "tiles_path": self.tiles_path,
+            "preview_path": self.preview_path,
+            "tile_min_zoom": self.tile_min_zoom,
+            "image_pending": self.pending_image_path is not None
+        }
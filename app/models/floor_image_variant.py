@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, func
+from app.database import Base
+
+class FloorImageVariant(Base):
+    __tablename__ = "floor_image_variants"
+    __table_args__ = (
+        UniqueConstraint("floor_id", "kind", name="uq_floor_image_variants_floor_kind"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    floor_id = Column(Integer, ForeignKey('floors.id', ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False) # 'thumbnail', 'webp', '2x', '1x', '0.5x'
+    source_path = Column(String, nullable=False) # floors.image_path it was rendered from
+    url = Column(String, nullable=False) # /static/assets/floors/<id>/<token>/<kind>.webp, full.webp for webp
+    format = Column(String, nullable=False) # 'webp'
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "format": self.format,
+            "width": self.width,
+            "height": self.height,
+            "bytes": self.bytes
+        }
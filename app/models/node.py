@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from geoalchemy2 import Geometry
 from app.database import Base
 
 class NetworkNode(Base):
     __tablename__ = "network_nodes"
+    __table_args__ = (
+        # Floor-scoped queries (GET /api/nodes?floor_id=X&types=...)
+        Index("ix_network_nodes_floor_id_type", "floor_id", "type"),
+        # Substring / similarity search (GET /api/search), needs the pg_trgm extension
+        Index("ix_network_nodes_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_network_nodes_assigned_to_trgm", "assigned_to", postgresql_using="gin", postgresql_ops={"assigned_to": "gin_trgm_ops"}),
+        Index("ix_network_nodes_point_number_trgm", "point_number", postgresql_using="gin", postgresql_ops={"point_number": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -13,12 +21,12 @@ class NetworkNode(Base):
     floor_id = Column(Integer, ForeignKey('floors.id'), nullable=False, default=1)
     assigned_to = Column(String, nullable=True) # Responsible person (for Ramal/Equipamento)
     details = Column(String, nullable=True) # Extra info (Asset ID, Description, Text Content)
-    geom = Column(Geometry(geometry_type='POINT', srid=4326), nullable=True)
+    geom = Column(Geometry(geometry_type='POINT', srid=4326, spatial_index=True), nullable=True) # GIST index: idx_network_nodes_geom
 
     def to_geojson(self):
         """Helper to convert node to GeoJSON feature"""
-        # Note: In a real scenario, use proper serialization libraries like shapely or geojson
-        # This is a lightweight manual implementation for the MVP
+        # Single-object responses only. Collections are serialized by PostGIS
+        # (see NodeRepository.feature_collection_json), keep both shapes in sync.
         import json
         from geoalchemy2.shape import to_shape
         
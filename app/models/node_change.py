@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, func
+from app.database import Base
+
+class NodeChange(Base):
+    __tablename__ = "node_changes"
+
+    id = Column(BigInteger, primary_key=True) # Monotonic cursor for GET /api/nodes/changes
+    node_id = Column(Integer, nullable=False, index=True) # No FK: tombstones outlive the node
+    floor_id = Column(Integer, nullable=True, index=True) # Floor the node was on for this change
+    op = Column(String, nullable=False) # 'insert', 'update', 'delete'
+    changed_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func
+from app.database import Base
+
+class NodeOcsBinding(Base):
+    __tablename__ = "node_ocs_bindings"
+
+    node_id = Column(Integer, ForeignKey('network_nodes.id', ondelete="CASCADE"), primary_key=True)
+    hardware_id = Column(Integer, nullable=False, index=True) # OCS hardware.ID (no FK: lives in MySQL)
+    ocs_name = Column(String, nullable=True) # OCS hostname when bound, for display / rename detection
+    source = Column(String, nullable=False) # 'audit' (exact name match) or 'editor'
+    confirmed = Column(Boolean, nullable=False, default=False)
+    confirmed_by = Column(String, nullable=True) # Username of the editor who confirmed it
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "node_id": self.node_id,
+            "hardware_id": self.hardware_id,
+            "ocs_name": self.ocs_name,
+            "source": self.source,
+            "confirmed": self.confirmed,
+            "confirmed_by": self.confirmed_by,
+            "updated_at": self.updated_at
+        }
@@ -0,0 +1,87 @@
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Index, text
+from app.database import Base
+
+# Read-only copies of the OCS Inventory (MySQL) tables, refreshed by app/services/ocs_mirror.py.
+# Primary keys are the OCS ids so incremental syncs can upsert in place.
+
+class OcsHardware(Base):
+    __tablename__ = "ocs_hardware"
+    __table_args__ = (
+        # OCS compares names case-insensitively (MySQL collation), the mirror matches on upper(name)
+        Index("ix_ocs_hardware_name_upper", text("upper(name)")),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False) # hardware.ID
+    name = Column(String, nullable=True)
+    workgroup = Column(String, nullable=True)
+    osname = Column(String, nullable=True)
+    ipaddr = Column(String, nullable=True)
+    userid = Column(String, nullable=True)
+    memory = Column(BigInteger, nullable=True) # MB
+    processort = Column(String, nullable=True)
+    lastdate = Column(DateTime, nullable=True, index=True) # Last inventory; drives the incremental sync
+    lastcome = Column(DateTime, nullable=True)
+
+class OcsAccountInfo(Base):
+    __tablename__ = "ocs_accountinfo"
+
+    hardware_id = Column(Integer, primary_key=True, autoincrement=False)
+    tag = Column(String, nullable=True) # 'DESATIVADO', 'SERVIDORES', ... excluded from the inventory
+
+class OcsBios(Base):
+    __tablename__ = "ocs_bios"
+
+    hardware_id = Column(Integer, primary_key=True, autoincrement=False)
+    smodel = Column(String, nullable=True)
+
+class OcsStorage(Base):
+    __tablename__ = "ocs_storages"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    hardware_id = Column(Integer, nullable=False, index=True)
+    disksize = Column(BigInteger, nullable=True) # MB
+
+class OcsNetwork(Base):
+    __tablename__ = "ocs_networks"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    hardware_id = Column(Integer, nullable=False, index=True)
+    ipaddress = Column(String, nullable=True)
+
+class OcsSoftware(Base):
+    __tablename__ = "ocs_software"
+    __table_args__ = (
+        # Software search: machines per (name, version) group, answered from the index alone
+        Index("ix_ocs_software_name_version", "name_id", "version_id", "hardware_id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    hardware_id = Column(Integer, nullable=False, index=True)
+    name_id = Column(Integer, nullable=True)
+    version_id = Column(Integer, nullable=True)
+
+class OcsSoftwareName(Base):
+    __tablename__ = "ocs_software_name"
+    __table_args__ = (
+        # Substring / prefix software search, needs the pg_trgm extension
+        Index("ix_ocs_software_name_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=True)
+
+class OcsSoftwareVersion(Base):
+    __tablename__ = "ocs_software_version"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(String, nullable=True)
+
+class OcsSyncState(Base):
+    __tablename__ = "ocs_sync_state"
+
+    name = Column(String, primary_key=True) # 'hardware'
+    watermark = Column(DateTime, nullable=True) # Highest hardware.LASTDATE copied so far
+    last_sync_at = Column(DateTime, nullable=True) # End of the last successful sync (local clock)
+    last_full_sync_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    machines = Column(Integer, nullable=True)
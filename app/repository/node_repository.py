@@ -0,0 +1,125 @@
+from sqlalchemy import func, cast, literal_column, literal, case, or_, and_, Text, Integer, REAL
+from sqlalchemy.dialects.postgresql import JSON, ARRAY, aggregate_order_by
+from sqlalchemy.orm import Session
+from app.models.node import NetworkNode
+
+# Same shape as NetworkNode.to_geojson(), built by PostGIS instead of Python.
+# Nodes without geometry fall back to [0, 0] like to_geojson() does.
+NODE_FEATURE = func.json_build_object(
+    "type", "Feature",
+    "id", NetworkNode.id,
+    "geometry", func.coalesce(
+        cast(func.ST_AsGeoJSON(NetworkNode.geom), JSON),
+        literal_column("""'{"type": "Point", "coordinates": [0, 0]}'::json""")
+    ),
+    "properties", func.json_build_object(
+        "id", NetworkNode.id,
+        "name", NetworkNode.name,
+        "type", NetworkNode.type,
+        "ip_address", NetworkNode.ip_address,
+        "point_number", NetworkNode.point_number,
+        "floor_id", NetworkNode.floor_id,
+        "assigned_to", NetworkNode.assigned_to,
+        "details", NetworkNode.details
+    )
+)
+
+EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+class NodeRepository:
+    @staticmethod
+    def filtered_query(db: Session, floor_id: int | None = None, bbox: tuple[float, float, float, float] | None = None, types: list[str] | None = None):
+        """
+        Builds the node query for the visible portion of the map.
+        floor_id + types hit the composite (floor_id, type) index, the bbox
+        is an envelope (&&) test that uses the GIST index on geom.
+        """
+        query = db.query(NetworkNode)
+
+        if floor_id is not None:
+            query = query.filter(NetworkNode.floor_id == floor_id)
+        if types:
+            query = query.filter(NetworkNode.type.in_(types))
+        if bbox is not None:
+            min_x, min_y, max_x, max_y = bbox
+            envelope = func.ST_MakeEnvelope(min_x, min_y, max_x, max_y, 4326)
+            query = query.filter(NetworkNode.geom.intersects(envelope))
+
+        return query
+
+    @staticmethod
+    def features_json(db: Session, query, order_by=None) -> str:
+        """
+        Serializes the rows of `query` as a JSON array of GeoJSON features
+        entirely inside PostgreSQL. Returns the raw JSON text (no ORM objects).
+        `order_by` (SQL expression) fixes the order of the array.
+        """
+        if order_by is None:
+            sub = query.with_entities(NODE_FEATURE.label("feature")).subquery()
+            aggregated = func.json_agg(sub.c.feature)
+        else:
+            sub = query.with_entities(NODE_FEATURE.label("feature"), order_by.label("ord")).subquery()
+            aggregated = func.json_agg(aggregate_order_by(sub.c.feature, sub.c.ord))
+        features = func.coalesce(aggregated, EMPTY_JSON_ARRAY)
+        return db.query(cast(features, Text)).select_from(sub).scalar()
+
+    @staticmethod
+    def feature_collection_json(db: Session, query) -> str:
+        """
+        Same as features_json() but wrapped in a FeatureCollection.
+        """
+        sub = query.with_entities(NODE_FEATURE.label("feature")).subquery()
+        collection = func.json_build_object(
+            "type", "FeatureCollection",
+            "features", func.coalesce(func.json_agg(sub.c.feature), EMPTY_JSON_ARRAY)
+        )
+        return db.query(cast(collection, Text)).select_from(sub).scalar()
+
+    @staticmethod
+    def search(db: Session, q: str, limit: int = 30, after: tuple[int, float, int] | None = None):
+        """
+        Ranked search over name, assigned_to and point_number (pg_trgm GIN indexes).
+        Order: exact point_number match first, then best trigram similarity, then id.
+        Keyset pagination: `after` is the (exact, score, id) of the last row of the
+        previous page. Returns (features JSON text, key of the last row or None).
+        """
+        term = f"%{q}%"
+        exact = case((NetworkNode.point_number == q, 1), else_=0)
+        score = func.greatest(
+            func.similarity(NetworkNode.name, q),
+            func.similarity(NetworkNode.assigned_to, q),
+            func.similarity(NetworkNode.point_number, q)
+        )
+
+        query = db.query(NetworkNode.id, exact.label("exact"), score.label("score")).filter(
+            or_(
+                NetworkNode.point_number == q,
+                NetworkNode.name.ilike(term),
+                NetworkNode.assigned_to.ilike(term),
+                NetworkNode.point_number.ilike(term),
+                NetworkNode.name.op("%")(q) # Typo tolerant (pg_trgm similarity threshold)
+            )
+        )
+        if after is not None:
+            after_exact, after_score, after_id = after
+            # similarity() is real (float4): compare as real, or a float8 parameter never
+            # equals the score it came from and ties on the page boundary are skipped
+            after_score = cast(after_score, REAL)
+            query = query.filter(or_(
+                exact < after_exact,
+                and_(exact == after_exact, score < after_score),
+                and_(exact == after_exact, score == after_score, NetworkNode.id > after_id)
+            ))
+
+        rows = query.order_by(exact.desc(), score.desc(), NetworkNode.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not rows:
+            return "[]", None
+
+        ids = [row.id for row in rows]
+        position = func.array_position(literal(ids, ARRAY(Integer)), NetworkNode.id)
+        features = NodeRepository.features_json(db, db.query(NetworkNode).filter(NetworkNode.id.in_(ids)), order_by=position)
+
+        last = rows[-1]
+        return features, ((last.exact, float(last.score), last.id) if has_more else None)
@@ -0,0 +1,7 @@
+from typing import Literal
+from pydantic import BaseModel
+
+class ExportJobCreate(BaseModel):
+    format: Literal["xlsx", "csv", "ndjson"] = "xlsx"
+    types: list[str] | None = None # Node types, all when empty
+    fields: list[str] | None = None # Keys of export.FIELD_MAP, all columns when empty
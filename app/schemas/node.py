@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+
+class NodeCreate(BaseModel):
+    name: str
+    type: str # 'Computador', 'Ponto', 'Ramal'
+    ip_address: str | None = None
+    point_number: str | None = None
+    assigned_to: str | None = None
+    details: str | None = None
+    floor_id: int
+    x: float
+    y: float
+
+class NodeUpdate(BaseModel):
+    name: str | None = None
+    type: str | None = None
+    point_number: str | None = None
+    assigned_to: str | None = None
+    details: str | None = None
+    floor_id: int | None = None
+    x: float | None = None
+    y: float | None = None
+
+class NodeBulkUpdate(NodeUpdate):
+    id: int
+
+class NodeBulkRequest(BaseModel):
+    # Rows are validated one by one (NodeCreate / NodeBulkUpdate) so a bad row
+    # is reported in the results instead of rejecting the whole batch.
+    create: list[dict] = []
+    update: list[dict] = []
+    delete: list[int] = []
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+class OcsMachinesRequest(BaseModel):
+    # Either a list of hostnames or a floor (all of its computers)
+    hostnames: list[str] | None = None
+    floor_id: int | None = None
+
+class OcsBindingUpdate(BaseModel):
+    # OCS hardware.ID to bind the node to; empty confirms the binding found by the audit
+    hardware_id: int | None = None
@@ -0,0 +1,66 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.node import NetworkNode
+from app.models.node_ocs_binding import NodeOcsBinding
+
+# Node <-> OCS hardware.ID links. Once a node is bound, OCS lookups go by primary key,
+# so renames in OCS (or on the map) no longer break the link.
+
+def hardware_ids_by_node(db: Session) -> dict[int, int]:
+    """
+    {node id: OCS hardware id} of every bound node.
+    """
+    return dict(db.query(NodeOcsBinding.node_id, NodeOcsBinding.hardware_id))
+
+def hardware_ids_by_name(db: Session, names: list[str]) -> dict[str, int]:
+    """
+    {UPPER(node name): OCS hardware id} for the bound computers with these names.
+    """
+    upper_names = list({name.upper() for name in names if name})
+    if not upper_names:
+        return {}
+    rows = (
+        db.query(NetworkNode.name, NodeOcsBinding.hardware_id)
+        .join(NodeOcsBinding, NodeOcsBinding.node_id == NetworkNode.id)
+        .filter(func.upper(NetworkNode.name).in_(upper_names))
+    )
+    return {name.upper(): hardware_id for name, hardware_id in rows}
+
+def record_audit_matches(db: Session, matches: list[dict]) -> list[dict]:
+    """
+    Binds nodes matched by name in the audit ({'node_id', 'hardware_id', 'ocs_name'}).
+    Existing bindings (confirmed or not) are kept. Commits.
+    Returns the matches actually recorded.
+    """
+    if not matches:
+        return []
+    rows = [{**match, "source": "audit", "confirmed": False} for match in matches]
+    try:
+        inserted = db.execute(
+            pg_insert(NodeOcsBinding).values(rows)
+            .on_conflict_do_nothing(index_elements=["node_id"])
+            .returning(NodeOcsBinding.node_id)
+        ).scalars().all()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"ERROR: Failed to record OCS bindings: {e}")
+        raise
+    inserted = set(inserted)
+    return [match for match in matches if match["node_id"] in inserted]
+
+def set_binding(db: Session, node_id: int, hardware_id: int, ocs_name: str | None, username: str) -> NodeOcsBinding:
+    """
+    Binds (or re-binds) a node to an OCS machine, confirmed by an editor. Caller commits.
+    """
+    binding = db.get(NodeOcsBinding, node_id)
+    if binding is None:
+        binding = NodeOcsBinding(node_id=node_id)
+        db.add(binding)
+    binding.hardware_id = hardware_id
+    binding.ocs_name = ocs_name
+    binding.source = "editor"
+    binding.confirmed = True
+    binding.confirmed_by = username
+    return binding
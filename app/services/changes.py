@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app import database
+from app.models.node import NetworkNode
+from app.models.node_change import NodeChange
+from app.repository.node_repository import NodeRepository
+from app.services import versions
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# Changes older than this are pruned; clients with an older cursor reload everything
+RETENTION_DAYS = int(os.getenv("NODE_CHANGES_RETENTION_DAYS", "7"))
+# Seconds between prunes (0 disables the background job)
+PRUNE_INTERVAL = int(os.getenv("NODE_CHANGES_PRUNE_INTERVAL", "3600"))
+
+def record(db: Session, op: str, entries: list[tuple[int, int | None]]):
+    """
+    Appends (node_id, floor_id) entries to the change log inside the caller's transaction.
+    Bumping the nodes version first takes the row lock on data_versions('nodes'),
+    so writers are serialized and cursors become visible in commit order.
+    """
+    versions.bump(db, versions.NODES)
+    if entries:
+        db.add_all([NodeChange(node_id=node_id, floor_id=floor_id, op=op) for node_id, floor_id in entries])
+
+def current_cursor(db: Session) -> int:
+    return db.query(func.max(NodeChange.id)).scalar() or 0
+
+def get_changes(db: Session, since: int, floor_id: int | None = None) -> str:
+    """
+    Returns the delta since `since` as JSON text:
+        {"cursor": N, "reset": bool, "deleted": [ids], "upserted": [features]}
+    Several changes to the same node collapse into its current state: a node that
+    still exists (on the requested floor) is upserted, otherwise it is deleted.
+    """
+    cursor = current_cursor(db)
+
+    # Cursor from the future (e.g. database restored): the client must reload everything.
+    if since > cursor:
+        return json.dumps({"cursor": cursor, "reset": True, "deleted": [], "upserted": []})
+
+    # Changes after the cursor were pruned: the delta would be incomplete.
+    oldest = db.query(func.min(NodeChange.id)).scalar()
+    if oldest is not None and since < oldest - 1:
+        return json.dumps({"cursor": cursor, "reset": True, "deleted": [], "upserted": []})
+
+    changed = db.query(NodeChange.node_id).filter(NodeChange.id > since, NodeChange.id <= cursor)
+    if floor_id is not None:
+        changed = changed.filter(NodeChange.floor_id == floor_id)
+    changed_ids = {row[0] for row in changed.distinct()}
+
+    if not changed_ids:
+        return json.dumps({"cursor": cursor, "reset": False, "deleted": [], "upserted": []})
+
+    current = db.query(NetworkNode).filter(NetworkNode.id.in_(changed_ids))
+    if floor_id is not None:
+        current = current.filter(NetworkNode.floor_id == floor_id)
+    existing_ids = {row[0] for row in current.with_entities(NetworkNode.id)}
+    deleted = sorted(changed_ids - existing_ids)
+
+    upserted = NodeRepository.features_json(db, current) if existing_ids else "[]"
+
+    # Features are already JSON text built by PostGIS, splice them in as-is.
+    head = json.dumps({"cursor": cursor, "reset": False, "deleted": deleted})
+    return head[:-1] + ', "upserted": ' + upserted + "}"
+
+def prune(db: Session) -> int:
+    """
+    Deletes changes older than RETENTION_DAYS. The newest change is always kept so
+    the cursor never goes back. Returns the number of rows deleted. Commits.
+    """
+    newest = current_cursor(db)
+    deleted = db.query(NodeChange).filter(
+        NodeChange.changed_at < datetime.now() - timedelta(days=RETENTION_DAYS),
+        NodeChange.id < newest
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def _prune_once():
+    db = database.SessionLocal()
+    try:
+        deleted = prune(db)
+        if deleted:
+            print(f"INFO: Pruned {deleted} node changes older than {RETENTION_DAYS} days")
+    except Exception as e:
+        db.rollback()
+        print(f"ERROR: Failed to prune node changes: {e}")
+    finally:
+        db.close()
+
+async def run_prune_loop():
+    """
+    Background job started with the app: keeps node_changes within RETENTION_DAYS.
+    """
+    if PRUNE_INTERVAL <= 0:
+        print("INFO: Node change pruning disabled.")
+        return
+    while True:
+        await asyncio.to_thread(_prune_once)
+        await asyncio.sleep(PRUNE_INTERVAL)
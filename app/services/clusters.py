@@ -0,0 +1,78 @@
+import os
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app.core.cache import LRUCache
+from app.services import versions
+
+# Screen size of a cluster cell; in map units it shrinks as the zoom grows (L.CRS.Simple).
+CLUSTER_CELL_PX = int(os.getenv("CLUSTER_CELL_PX", "64"))
+
+# (floor_id, zoom, nodes version) -> clusters. Node writes change the version,
+# so stale entries are never hit again and age out of the LRU.
+cluster_cache = LRUCache(maxsize=int(os.getenv("CLUSTER_CACHE_SIZE", "256")))
+
+def cell_size(zoom: float) -> float:
+    return CLUSTER_CELL_PX / (2 ** zoom)
+
+def _build_clusters(db: Session, floor_id: int, size: float) -> list[dict]:
+    # One row per (grid cell, type): counts and centroid are computed by PostGIS,
+    # Python only merges the few type rows of each cell.
+    query = text("""
+        WITH cells AS (
+            SELECT ST_SnapToGrid(geom, :size) AS cell, type, geom, id
+            FROM network_nodes
+            WHERE floor_id = :floor_id AND geom IS NOT NULL
+        )
+        SELECT ST_X(cell) AS cell_x, ST_Y(cell) AS cell_y, type, count(*) AS total,
+               ST_X(ST_Centroid(ST_Collect(geom))) AS x,
+               ST_Y(ST_Centroid(ST_Collect(geom))) AS y,
+               array_agg(id) FILTER (WHERE type = 'Computador') AS computer_ids
+        FROM cells
+        GROUP BY cell, type
+    """)
+    rows = db.execute(query, {"floor_id": floor_id, "size": size}).mappings().all()
+
+    clusters = {}
+    for row in rows:
+        key = (row["cell_x"], row["cell_y"])
+        cluster = clusters.setdefault(key, {"x": 0.0, "y": 0.0, "count": 0, "types": {}, "computer_ids": []})
+        # Weighted centroid of the per-type centroids
+        total = cluster["count"] + row["total"]
+        cluster["x"] = (cluster["x"] * cluster["count"] + row["x"] * row["total"]) / total
+        cluster["y"] = (cluster["y"] * cluster["count"] + row["y"] * row["total"]) / total
+        cluster["count"] = total
+        cluster["types"][row["type"]] = row["total"]
+        cluster["computer_ids"].extend(row["computer_ids"] or [])
+
+    return list(clusters.values())
+
+def get_floor_clusters(db: Session, floor_id: int, zoom: float, status_map: dict | None = None) -> dict:
+    """
+    Pre-aggregated markers of a floor for a zoom level: one entry per grid cell with
+    its centroid, total and counts per type. With `status_map` (NodeID -> color),
+    computers are also counted per status color.
+    """
+    size = cell_size(zoom)
+    key = (floor_id, zoom, versions.current(db, versions.NODES))
+    clusters = cluster_cache.get(key)
+    if clusters is None:
+        clusters = _build_clusters(db, floor_id, size)
+        cluster_cache.set(key, clusters)
+
+    result = []
+    for cluster in clusters:
+        item = {
+            "x": cluster["x"],
+            "y": cluster["y"],
+            "count": cluster["count"],
+            "types": cluster["types"]
+        }
+        if status_map is not None:
+            status_counts = {}
+            for node_id in cluster["computer_ids"]:
+                color = status_map.get(node_id, "unknown")
+                status_counts[color] = status_counts.get(color, 0) + 1
+            item["status"] = status_counts
+        result.append(item)
+
+    return {"floor_id": floor_id, "zoom": zoom, "cell_size": size, "clusters": result}
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+from app import database
+from app.services import inventory, health
+
+# How often the shared monitors refresh (seconds). They only run while someone is subscribed.
+STATUS_INTERVAL = int(os.getenv("EVENTS_STATUS_INTERVAL", "60"))
+HEALTH_INTERVAL = int(os.getenv("EVENTS_HEALTH_INTERVAL", "30"))
+# Messages buffered per client before it is considered too slow and dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+# Queued instead of a message to end a dropped subscriber's stream (the browser reconnects)
+CLOSED = None
+
+def format_event(event: str, data) -> str:
+    """
+    Server-Sent Events wire format.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class EventHub:
+    """
+    In-process fan-out of server events to SSE subscribers.
+    Each event is serialized once and the same string is queued for every client.
+    """
+
+    def __init__(self):
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._snapshots: dict[str, str] = {} # Last 'status'/'health' message, replayed to new clients
+        self.wakeup = asyncio.Event()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def has_snapshot(self, event: str) -> bool:
+        return event in self._snapshots
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for message in self._snapshots.values():
+            queue.put_nowait(message)
+        self._subscribers.add(queue)
+        # First subscriber (or no snapshot yet): let the monitors run right away
+        self.wakeup.set()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data, snapshot: bool = False):
+        """
+        Thread-safe: sync endpoints run in the threadpool, so hop onto the loop.
+        """
+        if self._loop is None:
+            return
+        message = format_event(event, data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fanout(event, message, snapshot)
+        else:
+            self._loop.call_soon_threadsafe(self._fanout, event, message, snapshot)
+
+    def _fanout(self, event: str, message: str, snapshot: bool):
+        if snapshot:
+            self._snapshots[event] = message
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                print("WARNING: Dropping slow SSE subscriber")
+                self._subscribers.discard(queue)
+                self._close(queue)
+
+    @staticmethod
+    def _close(queue: asyncio.Queue):
+        # Its backlog is stale anyway: make room for the sentinel that ends the stream
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(CLOSED)
+
+hub = EventHub()
+
+def _compute_status() -> dict:
+    status_map, _ = inventory.get_cached_status_map()
+    return status_map
+
+def _compute_health() -> dict:
+    local_db = database.SessionLocal()
+    ocs_db = database.ocs_session()
+    try:
+        return health.check_connections(local_db, ocs_db)
+    finally:
+        local_db.close()
+        if ocs_db:
+            ocs_db.close()
+
+async def run_monitors():
+    """
+    Computes inventory status and DB health once per interval and broadcasts
+    them only when they change, no matter how many tabs are subscribed.
+    """
+    loop = asyncio.get_running_loop()
+    next_status = next_health = 0.0
+    last_status = last_health = None
+
+    while True:
+        if hub.subscriber_count == 0:
+            hub.wakeup.clear()
+            await hub.wakeup.wait()
+
+        now = loop.time()
+        try:
+            if now >= next_health:
+                next_health = now + HEALTH_INTERVAL
+                result = await asyncio.to_thread(_compute_health)
+                if result != last_health:
+                    last_health = result
+                    hub.publish("health", result, snapshot=True)
+            if now >= next_status:
+                next_status = now + STATUS_INTERVAL
+                result = await asyncio.to_thread(_compute_status)
+                if result != last_status:
+                    last_status = result
+                    hub.publish("status", result, snapshot=True)
+        except Exception as e:
+            print(f"ERROR: Event monitors failed: {e}")
+
+        hub.wakeup.clear()
+        try:
+            await asyncio.wait_for(hub.wakeup.wait(), timeout=max(0.0, min(next_status, next_health) - loop.time()))
+            # A new subscriber arrived: replay happens from snapshots, only refresh if we have none yet
+            if not hub.has_snapshot("status"):
+                next_status = 0.0
+            if not hub.has_snapshot("health"):
+                next_health = 0.0
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,242 @@
+import csv
+import io
+import os
+import tempfile
+import orjson
+from app import database
+from app.models.node import NetworkNode
+from app.models.floor import Floor
+from app.models.node_ocs_binding import NodeOcsBinding
+from app.services import ocs, fetch_pool
+
+# Rows fetched from the server-side cursor (and enriched from OCS) per round
+CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+# Bytes per piece when streaming the finished XLSX file
+FILE_CHUNK_SIZE = 64 * 1024
+
+COLUMNS = [
+    "ID",
+    "Nome",
+    "Tipo",
+    "Andar",
+    "Ponto de Rede",
+    "Responsável",
+    "Detalhes",
+    "IP (Netmap)",
+    "OCS IP",
+    "OCS Processador",
+    "OCS Memória (MB)",
+    "OCS Disco (GB)",
+    "OCS OS",
+    "OCS Usuário",
+    "OCS Última Sincronização"
+]
+
+# Frontend field names -> columns
+FIELD_MAP = {
+    "name": "Nome",
+    "type": "Tipo",
+    "floor": "Andar",
+    "point": "Ponto de Rede",
+    "assigned": "Responsável",
+    "details": "Detalhes",
+    "ip": "IP (Netmap)",
+    "ocs_ip": "OCS IP",
+    "ocs_cpu": "OCS Processador",
+    "ocs_ram": "OCS Memória (MB)",
+    "ocs_disk": "OCS Disco (GB)",
+    "ocs_os": "OCS OS",
+    "ocs_user": "OCS Usuário",
+    "ocs_last": "OCS Última Sincronização"
+}
+
+FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+def parse_types(types: str | None) -> list[str] | None:
+    return [t.strip() for t in types.split(',')] if types else None
+
+def select_columns(fields: str | None) -> list[str]:
+    """
+    Requested columns in request order; every column when nothing valid was requested.
+    """
+    if not fields:
+        return list(COLUMNS)
+    requested = [FIELD_MAP[f.strip()] for f in fields.split(',') if f.strip() in FIELD_MAP]
+    return requested or list(COLUMNS)
+
+def _build_row(node, ocs_info: dict | None) -> dict:
+    row = {
+        "ID": node.id,
+        "Nome": node.name,
+        "Tipo": node.type,
+        "Andar": node.floor_name if node.floor_name else f"Desconhecido ({node.floor_id})",
+        "Ponto de Rede": node.point_number,
+        "Responsável": node.assigned_to,
+        "Detalhes": node.details,
+        "IP (Netmap)": node.ip_address,
+        # OCS Defaults
+        "OCS IP": None,
+        "OCS Processador": None,
+        "OCS Memória (MB)": None,
+        "OCS Disco (GB)": None,
+        "OCS OS": None,
+        "OCS Usuário": None,
+        "OCS Última Sincronização": None
+    }
+    if ocs_info:
+        # User Request: Use OCS IP as main IP
+        if ocs_info.get("IPADDR"):
+            row["IP (Netmap)"] = ocs_info.get("IPADDR")
+
+        row["OCS IP"] = ocs_info.get("IPADDR")
+        row["OCS Processador"] = ocs_info.get("PROCESSOR")
+        row["OCS Memória (MB)"] = ocs_info.get("MEMORY")
+
+        # Disk Size in GB
+        disk_mb = ocs_info.get("DISKSIZE")
+        if disk_mb:
+            try:
+                row["OCS Disco (GB)"] = round(float(disk_mb) / 1024, 1)
+            except (TypeError, ValueError):
+                row["OCS Disco (GB)"] = disk_mb
+
+        row["OCS OS"] = ocs_info.get("OSNAME")
+        row["OCS Usuário"] = ocs_info.get("USERID")
+        row["OCS Última Sincronização"] = ocs_info.get("LASTDATE")
+    return row
+
+def _node_query(db, types: list[str] | None):
+    # Plain columns (no ORM entities, no geometry) keep each row small
+    query = (
+        db.query(
+            NetworkNode.id, NetworkNode.name, NetworkNode.type, NetworkNode.floor_id,
+            NetworkNode.point_number, NetworkNode.assigned_to, NetworkNode.details,
+            NetworkNode.ip_address, Floor.name.label("floor_name"), NodeOcsBinding.hardware_id
+        )
+        .outerjoin(Floor, NetworkNode.floor_id == Floor.id)
+        .outerjoin(NodeOcsBinding, NodeOcsBinding.node_id == NetworkNode.id)
+        .order_by(NetworkNode.id)
+    )
+    if types:
+        query = query.filter(NetworkNode.type.in_(types))
+    return query
+
+def count_rows(db, types: list[str] | None) -> int:
+    query = db.query(NetworkNode.id)
+    if types:
+        query = query.filter(NetworkNode.type.in_(types))
+    return query.count()
+
+def iter_rows(types: list[str] | None, columns: list[str], chunk_size: int = CHUNK_SIZE, progress=None):
+    """
+    Yields lists of export rows (values in `columns` order), chunk by chunk.
+    Nodes come from a server-side cursor and each chunk is enriched with one batched
+    OCS lookup, so memory depends on the chunk size, not on the inventory size.
+    The lookup of a chunk runs on the fetch pool while the next chunk is read from
+    Postgres (at most one lookup in flight, with its own sessions).
+    Opens its own sessions: the generator outlives the request's dependencies.
+    progress(rows) is called after each chunk.
+    """
+    local_db = database.SessionLocal()
+    enrich_db = database.SessionLocal() # Mirror reads, used by one lookup at a time
+    ocs_db = database.ocs_session()
+    pending = None
+    try:
+        chunk = []
+        for node in _node_query(local_db, types).yield_per(chunk_size):
+            chunk.append(node)
+            if len(chunk) >= chunk_size:
+                if pending is not None:
+                    yield _finish(pending, progress)
+                pending = (fetch_pool.submit(_enrich, enrich_db, ocs_db, chunk, columns), len(chunk))
+                chunk = []
+        if pending is not None:
+            yield _finish(pending, progress)
+            pending = None
+        if chunk:
+            yield _enrich(enrich_db, ocs_db, chunk, columns)
+            if progress:
+                progress(len(chunk))
+    finally:
+        # Never close the sessions under a lookup that is still running
+        if pending is not None and not pending[0].cancel():
+            pending[0].exception() # Waits for it to finish
+        local_db.close()
+        enrich_db.close()
+        if ocs_db:
+            ocs_db.close()
+
+def _finish(pending: tuple, progress) -> list[list]:
+    future, size = pending
+    rows = future.result()
+    if progress:
+        progress(size)
+    return rows
+
+def _enrich(local_db, ocs_db, chunk: list, columns: list[str]) -> list[list]:
+    # Bound computers by OCS hardware id, the others by name
+    computers = [node for node in chunk if node.type == 'Computador']
+    ids = [node.hardware_id for node in computers if node.hardware_id is not None]
+    by_id = ocs.get_machines_by_ids(ocs_db, ids, local_db=local_db) if ids else {}
+    names = [node.name for node in computers if node.hardware_id not in by_id]
+    machines = ocs.get_machines_by_names(ocs_db, names, local_db=local_db) if names else {}
+    rows = []
+    for node in chunk:
+        ocs_info = None
+        if node.type == 'Computador':
+            ocs_info = by_id.get(node.hardware_id) or machines.get(node.name.upper())
+        row = _build_row(node, ocs_info)
+        rows.append([row[column] for column in columns])
+    return rows
+
+def stream_csv(types: list[str] | None, columns: list[str], progress=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for rows in iter_rows(types, columns, progress=progress):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def stream_ndjson(types: list[str] | None, columns: list[str], progress=None):
+    for rows in iter_rows(types, columns, progress=progress):
+        yield b"".join(orjson.dumps(dict(zip(columns, values))) + b"\n" for values in rows)
+
+def write_xlsx(types: list[str] | None, columns: list[str], target, progress=None) -> None:
+    """
+    Writes the workbook with openpyxl's write-only mode (rows go straight to disk).
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Inventario")
+    sheet.append(columns)
+    for rows in iter_rows(types, columns, progress=progress):
+        for values in rows:
+            sheet.append(values)
+    workbook.save(target)
+
+def stream_xlsx(types: list[str] | None, columns: list[str], progress=None):
+    """
+    XLSX is a zip whose directory is written last, so the file is built in a temporary
+    file first and then streamed from disk.
+    """
+    with tempfile.TemporaryFile(suffix=".xlsx") as tmp:
+        write_xlsx(types, columns, tmp, progress=progress)
+        tmp.seek(0)
+        while data := tmp.read(FILE_CHUNK_SIZE):
+            yield data
+
+STREAMERS = {
+    "xlsx": stream_xlsx,
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+}
@@ -0,0 +1,169 @@
+"""
+Background export jobs: a bounded worker pool writing artifacts to EXPORT_ARTIFACT_DIR.
+
+Jobs, their progress and the reuse index live in this process's memory. This only works
+with a single uvicorn worker (scripts/entrypoint.sh starts one): with several workers,
+GET /api/export/jobs/{id} and its download 404 whenever the request lands on another
+process. A restart forgets every job; files left in EXPORT_ARTIFACT_DIR are not reused.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from app import database
+from app.models.node_ocs_binding import NodeOcsBinding
+from app.services import export, versions, ocs_mirror
+from app.services.events import hub
+
+# At most this many exports run at once; the rest wait in the queue
+WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+# Finished artifacts are reused (and kept on disk) for this many seconds
+ARTIFACT_TTL = int(os.getenv("EXPORT_ARTIFACT_TTL", "3600"))
+ARTIFACT_DIR = os.getenv("EXPORT_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "netmap_exports"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+class ExportJob:
+    def __init__(self, key: str, fmt: str, types: list[str] | None, columns: list[str]):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fmt = fmt
+        self.types = types
+        self.columns = columns
+        self.status = QUEUED
+        self.rows = 0
+        self.total = None
+        self.error = None
+        self.path = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def filename(self) -> str:
+        stamp = time.strftime('%Y%m%d_%H%M', time.localtime(self.created_at))
+        return f"netmap_export_{stamp}.{export.FORMATS[self.fmt][1]}"
+
+    def expired(self, now: float) -> bool:
+        return self.finished_at is not None and now - self.finished_at > ARTIFACT_TTL
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "format": self.fmt,
+            "status": self.status,
+            "rows": self.rows,
+            "total": self.total,
+            "progress": round(self.rows / self.total, 3) if self.total else (1.0 if self.status == DONE else 0.0),
+            "error": self.error,
+            "filename": self.filename,
+            "download_url": f"/api/export/jobs/{self.id}/download" if self.status == DONE else None
+        }
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="export")
+_lock = threading.Lock()
+_jobs: dict[str, ExportJob] = {}
+_by_key: dict[str, ExportJob] = {} # Latest non-failed job per artifact key
+
+def _artifact_key(fmt: str, types: list[str] | None, columns: list[str]) -> str:
+    """
+    Same format, types, columns and data versions -> same file.
+    OCS data is versioned by the mirror's last sync; live OCS reads only by the artifact TTL.
+    """
+    db = database.SessionLocal()
+    try:
+        nodes_version = versions.current(db, versions.NODES)
+        floors_version = versions.current(db, versions.FLOORS)
+        state = ocs_mirror.get_state(db) if ocs_mirror.is_fresh(db) else None
+        ocs_version = state.last_sync_at.isoformat() if state else "live"
+        # Editors re-binding nodes to OCS machines change the OCS columns too
+        bindings_version = tuple(db.query(func.count(NodeOcsBinding.node_id), func.max(NodeOcsBinding.updated_at)).one())
+    finally:
+        db.close()
+    raw = repr((fmt, sorted(types or []), columns, nodes_version, floors_version, ocs_version, bindings_version))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def _publish(job: ExportJob):
+    hub.publish("export", job.to_dict())
+
+def _prune():
+    now = time.time()
+    with _lock:
+        expired = [job for job in _jobs.values() if job.expired(now)]
+        for job in expired:
+            del _jobs[job.id]
+            if _by_key.get(job.key) is job:
+                del _by_key[job.key]
+    for job in expired:
+        if job.path and os.path.exists(job.path):
+            os.remove(job.path)
+
+def submit(fmt: str, types: list[str] | None, columns: list[str]) -> tuple[ExportJob, bool]:
+    """
+    Returns (job, reused). An identical export that is queued, running or finished
+    (within ARTIFACT_TTL) is returned instead of starting a new one.
+    """
+    _prune()
+    key = _artifact_key(fmt, types, columns)
+    with _lock:
+        existing = _by_key.get(key)
+        if existing and (existing.status != DONE or (existing.path and os.path.exists(existing.path))):
+            return existing, True
+        job = ExportJob(key, fmt, types, columns)
+        _jobs[job.id] = job
+        _by_key[key] = job
+    _executor.submit(_run, job)
+    _publish(job)
+    return job, False
+
+def get(job_id: str) -> ExportJob | None:
+    return _jobs.get(job_id)
+
+def _run(job: ExportJob):
+    job.status = RUNNING
+
+    def progress(rows: int):
+        job.rows += rows
+        _publish(job)
+
+    path = os.path.join(ARTIFACT_DIR, f"{job.id}.{export.FORMATS[job.fmt][1]}")
+    partial = f"{path}.part"
+    try:
+        db = database.SessionLocal()
+        try:
+            job.total = export.count_rows(db, job.types)
+        finally:
+            db.close()
+        _publish(job)
+
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        if job.fmt == "xlsx":
+            export.write_xlsx(job.types, job.columns, partial, progress=progress)
+        else:
+            with open(partial, "wb") as f:
+                for data in export.STREAMERS[job.fmt](job.types, job.columns, progress=progress):
+                    f.write(data)
+        os.replace(partial, path)
+        job.path = path
+        job.status = DONE
+    except Exception as e:
+        print(f"ERROR: Export job {job.id} failed: {e}")
+        job.status = ERROR
+        job.error = str(e)
+        if os.path.exists(partial):
+            os.remove(partial)
+        with _lock:
+            if _by_key.get(job.key) is job:
+                del _by_key[job.key]
+    finally:
+        job.finished_at = time.time()
+        _publish(job)
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,26 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# Bounded pool for running an OCS query while the caller queries Postgres (audit, status, export).
+# Each task uses its own session/connection: a Session must never be shared between threads.
+WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+# CONCURRENT_FETCH=0 runs everything on the caller's thread (debugging, benchmark baseline)
+ENABLED = os.getenv("CONCURRENT_FETCH", "1") != "0"
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="fetch")
+
+def submit(fn, *args) -> Future:
+    """
+    Runs fn(*args) on the pool, or right away on this thread when concurrency is disabled.
+    """
+    if ENABLED:
+        return _executor.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
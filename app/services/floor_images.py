@@ -0,0 +1,230 @@
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import uuid
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image
+
+STATIC_FLOORS_DIR = os.path.join("static", "assets", "floors")
+STATIC_FLOORS_URL = "/static/assets/floors"
+
+# Uploads are streamed in chunks, never held in memory as a whole
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("FLOOR_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+# Decompression bomb guard: a small file can declare a huge canvas.
+# Also makes PIL refuse to decode anything far above it (tile rendering included).
+MAX_IMAGE_PIXELS = int(os.getenv("FLOOR_MAX_IMAGE_PIXELS", str(150_000_000)))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Stored extension by detected format (the client's filename is not trusted)
+IMAGE_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif", "BMP": ".bmp", "TIFF": ".tif"}
+
+def read_image_header(path: str) -> tuple[str, int, int]:
+    """
+    Format and size from the image header only (Image.open does not decode pixels).
+    Raises ValueError for unsupported or oversized images.
+    """
+    try:
+        with Image.open(path) as img:
+            image_format, (width, height) = img.format, img.size
+    except Image.DecompressionBombError:
+        raise ValueError("Image dimensions exceed the allowed limit")
+    except Exception:
+        raise ValueError("File is not a supported image")
+
+    if image_format not in IMAGE_EXTENSIONS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Image too large: {width}x{height} exceeds {MAX_IMAGE_PIXELS} pixels")
+    return image_format, width, height
+
+async def save_upload(file: UploadFile) -> dict:
+    """
+    Streams an upload to disk in chunks (file I/O and hashing in worker threads),
+    validates it from the header and stores it as <sha256>.<ext>.
+    Identical images share one file, and a URL never changes content.
+    """
+    os.makedirs(STATIC_FLOORS_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    tmp = tempfile.NamedTemporaryFile(dir=STATIC_FLOORS_DIR, suffix=".part", delete=False)
+
+    def write_chunk(chunk: bytes):
+        hasher.update(chunk)
+        tmp.write(chunk)
+
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise ValueError(f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+            await run_in_threadpool(write_chunk, chunk)
+        await run_in_threadpool(tmp.close)
+
+        image_format, width, height = await run_in_threadpool(read_image_header, tmp.name)
+
+        filename = hasher.hexdigest() + IMAGE_EXTENSIONS[image_format]
+        file_path = os.path.join(STATIC_FLOORS_DIR, filename)
+        if os.path.exists(file_path):
+            os.remove(tmp.name) # Same content already stored
+        else:
+            os.replace(tmp.name, file_path)
+    except BaseException:
+        tmp.close()
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+
+    return {
+        "file_path": file_path,
+        "image_path": f"{STATIC_FLOORS_URL}/{filename}",
+        "width": width,
+        "height": height
+    }
+
+def delete_image(image_path: str):
+    """
+    Removes a stored floor image (/static/assets/floors/...) from disk.
+    The caller checks that no other floor still uses it.
+    """
+    full_path = os.path.abspath(image_path.lstrip("/"))
+    if not full_path.startswith(os.path.abspath(STATIC_FLOORS_DIR) + os.sep):
+        print(f"WARNING: Refusing to delete {full_path}: outside {STATIC_FLOORS_DIR}")
+        return
+    if not os.path.exists(full_path):
+        print(f"WARNING: Image file not found at {full_path}, skipping filesystem deletion.")
+        return
+    try:
+        os.remove(full_path)
+        print(f"INFO: Deleted floor image file: {full_path}")
+    except Exception as e:
+        print(f"ERROR: Failed to delete image file {full_path}: {e}")
+
+# Same grid as the map (L.CRS.Simple, minZoom -3): zoom 0 is the native resolution,
+# each lower zoom halves it. Higher zooms are upscaled by Leaflet (maxNativeZoom 0).
+TILE_SIZE = 256
+TILE_MIN_ZOOM = -3
+TILE_FORMAT = "webp"
+TILE_QUALITY = 80
+PREVIEW_MAX_SIZE = 1024
+
+# Whole-image variants rendered next to the pyramid ('webp' is the native size).
+# Scaled sizes are relative to a typical map width and skipped when not smaller than the original.
+VARIANT_FORMAT = "webp"
+VARIANT_QUALITY = 80
+VARIANT_BASE_WIDTH = int(os.getenv("FLOOR_VARIANT_BASE_WIDTH", "2048"))
+VARIANT_SCALES = {"2x": 2.0, "1x": 1.0, "0.5x": 0.5}
+THUMBNAIL_SIZE = 320
+WEBP_MAX_DIMENSION = 16383 # Format limit
+
+def floor_dir(floor_id: int) -> str:
+    return os.path.join(STATIC_FLOORS_DIR, str(floor_id))
+
+def _render_zoom(img: Image.Image, target_dir: str, z: int):
+    scale = 2 ** z
+    width = max(1, round(img.width * scale))
+    height = max(1, round(img.height * scale))
+    scaled = img if z == 0 else img.resize((width, height), Image.LANCZOS)
+
+    # The image spans map y in [0, height] and CRS.Simple flips y, so in pixel space
+    # it starts at -height (top) and ends at 0 (bottom): tile rows are negative.
+    first_row = math.floor(-height / TILE_SIZE)
+    columns = math.ceil(width / TILE_SIZE)
+
+    for ty in range(first_row, 0):
+        top = ty * TILE_SIZE + height
+        for tx in range(columns):
+            left = tx * TILE_SIZE
+            # crop() pads outside the image with transparent pixels (RGBA)
+            tile = scaled.crop((left, top, left + TILE_SIZE, top + TILE_SIZE))
+            tile_dir = os.path.join(target_dir, str(z), str(tx))
+            os.makedirs(tile_dir, exist_ok=True)
+            tile.save(os.path.join(tile_dir, f"{ty}.{TILE_FORMAT}"), quality=TILE_QUALITY)
+
+def _save_variant(img: Image.Image, target_dir: str, base_url: str, kind: str) -> dict:
+    filename = f"{'full' if kind == VARIANT_FORMAT else kind}.{VARIANT_FORMAT}"
+    path = os.path.join(target_dir, filename)
+    img.save(path, quality=VARIANT_QUALITY, method=4)
+    return {
+        "kind": kind,
+        "url": f"{base_url}/{filename}",
+        "format": VARIANT_FORMAT,
+        "width": img.width,
+        "height": img.height,
+        "bytes": os.path.getsize(path)
+    }
+
+def _render_variants(img: Image.Image, target_dir: str, base_url: str) -> list[dict]:
+    variants = []
+    if max(img.size) <= WEBP_MAX_DIMENSION:
+        variants.append(_save_variant(img, target_dir, base_url, VARIANT_FORMAT))
+
+    for kind, scale in VARIANT_SCALES.items():
+        width = round(VARIANT_BASE_WIDTH * scale)
+        if width >= img.width:
+            continue
+        height = max(1, round(img.height * width / img.width))
+        if height > WEBP_MAX_DIMENSION:
+            continue
+        variants.append(_save_variant(img.resize((width, height), Image.LANCZOS), target_dir, base_url, kind))
+
+    thumbnail = img.copy()
+    thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    variants.append(_save_variant(thumbnail, target_dir, base_url, "thumbnail"))
+    return variants
+
+def build_pyramid(image_path: str, floor_id: int) -> dict:
+    """
+    Renders the XYZ tile pyramid, a small preview and the whole-image variants of a
+    floor image into a new, never reused directory static/assets/floors/<id>/<token>/.
+    Nothing points to it until the caller stores the returned paths, which makes
+    the switch atomic. Blocking (CPU/disk heavy): call from a worker thread.
+    """
+    token = uuid.uuid4().hex[:12]
+    target_dir = os.path.join(floor_dir(floor_id), token)
+    os.makedirs(target_dir)
+
+    try:
+        with Image.open(image_path) as source:
+            has_alpha = "A" in source.getbands() or "transparency" in source.info
+            img = source.convert("RGBA")
+
+        for z in range(0, TILE_MIN_ZOOM - 1, -1):
+            _render_zoom(img, target_dir, z)
+
+        flat = img if has_alpha else img.convert("RGB")
+        preview = flat.convert("RGB")
+        preview.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE))
+        preview.save(os.path.join(target_dir, "preview.jpg"), quality=80)
+
+        base_url = f"{STATIC_FLOORS_URL}/{floor_id}/{token}"
+        variants = _render_variants(flat, target_dir, base_url)
+    except Exception:
+        shutil.rmtree(target_dir, ignore_errors=True)
+        raise
+
+    return {
+        "tiles_path": base_url + "/{z}/{x}/{y}." + TILE_FORMAT,
+        "preview_path": base_url + "/preview.jpg",
+        "tile_min_zoom": TILE_MIN_ZOOM,
+        "variants": variants
+    }
+
+def remove_old_pyramids(floor_id: int, keep_tiles_path: str | None = None):
+    """
+    Deletes every pyramid of the floor except the one referenced by keep_tiles_path.
+    """
+    directory = floor_dir(floor_id)
+    if not os.path.isdir(directory):
+        return
+    keep = None
+    if keep_tiles_path:
+        keep = keep_tiles_path[len(f"{STATIC_FLOORS_URL}/{floor_id}/"):].split("/", 1)[0]
+    for entry in os.listdir(directory):
+        if entry != keep:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    if keep is None:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,166 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app import database
+from app.models.floor import Floor
+from app.models.floor_image_variant import FloorImageVariant
+from app.services import floor_images, versions
+
+# Derivatives (tile pyramid, preview, WebP variants) are rendered off the request path.
+# Few workers: each job decodes a full floor plan in memory.
+WORKERS = int(os.getenv("FLOOR_PIPELINE_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="floor-derivatives")
+
+def schedule(floor_id: int, image_path: str):
+    """
+    Queues the derivatives of a floor image. Call after the commit that stored image_path.
+    """
+    _executor.submit(_run_job, floor_id, image_path)
+
+def schedule_missing():
+    """
+    Queues floors without derivatives of their current image, and pending replacement images
+    (uploads interrupted by a restart, floors older than the pipeline).
+    """
+    _executor.submit(_scan_missing)
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+def variants_by_floor(db: Session) -> dict[int, dict]:
+    """
+    {floor_id: {kind: variant}} for every floor, in one query.
+    Only variants of the floor's current image are listed.
+    """
+    result = {}
+    current = db.query(FloorImageVariant).join(Floor, and_(
+        Floor.id == FloorImageVariant.floor_id,
+        Floor.image_path == FloorImageVariant.source_path
+    ))
+    for variant in current:
+        result.setdefault(variant.floor_id, {})[variant.kind] = variant.to_dict()
+    return result
+
+def delete_image_if_unused(db: Session, image_path: str | None, floor_id: int):
+    """
+    Deletes a floor image file unless another floor uses it (current or pending):
+    content-addressed files can be shared by several floors.
+    """
+    if not image_path:
+        return
+    in_use = db.query(Floor.id).filter(
+        or_(Floor.image_path == image_path, Floor.pending_image_path == image_path),
+        Floor.id != floor_id
+    ).first()
+    if in_use:
+        print(f"INFO: Keeping {image_path}, still used by floor {in_use[0]}")
+        return
+    floor_images.delete_image(image_path)
+
+def _image_file(image_path: str) -> str:
+    return image_path.lstrip("/")
+
+def _swap_pending(floor: Floor) -> str | None:
+    # Makes the pending image current (with its size); returns the replaced image path
+    replaced = floor.image_path
+    floor.image_path = floor.pending_image_path
+    floor.width = floor.pending_width
+    floor.height = floor.pending_height
+    floor.pending_image_path = floor.pending_width = floor.pending_height = None
+    return replaced
+
+def _run_job(floor_id: int, image_path: str):
+    try:
+        result = floor_images.build_pyramid(_image_file(image_path), floor_id)
+    except Exception as e:
+        print(f"ERROR: Failed to build derivatives for floor {floor_id}: {e}")
+        _swap_without_derivatives(floor_id, image_path)
+        return
+
+    target_dir = os.path.dirname(result["preview_path"].lstrip("/"))
+    replaced = None
+    db = database.SessionLocal()
+    try:
+        # Row lock: a newer upload for the same floor either committed already (stale job) or waits
+        floor = db.query(Floor).filter(Floor.id == floor_id).with_for_update().first()
+        if floor is None or image_path not in (floor.image_path, floor.pending_image_path):
+            db.rollback()
+            shutil.rmtree(target_dir, ignore_errors=True)
+            print(f"INFO: Discarded stale derivatives for floor {floor_id}")
+            return
+
+        # Image, size, tiles and variants switch together: clients never mix old and new
+        if floor.pending_image_path == image_path:
+            replaced = _swap_pending(floor)
+        floor.tiles_path = result["tiles_path"]
+        floor.preview_path = result["preview_path"]
+        floor.tile_min_zoom = result["tile_min_zoom"]
+        db.query(FloorImageVariant).filter(FloorImageVariant.floor_id == floor_id).delete(synchronize_session=False)
+        db.add_all([FloorImageVariant(floor_id=floor_id, source_path=image_path, **variant) for variant in result["variants"]])
+        versions.bump(db, versions.FLOORS)
+        db.commit()
+        if replaced and replaced != image_path:
+            delete_image_if_unused(db, replaced, floor_id)
+    except Exception as e:
+        db.rollback()
+        shutil.rmtree(target_dir, ignore_errors=True)
+        print(f"ERROR: Failed to store derivatives for floor {floor_id}: {e}")
+        return
+    finally:
+        db.close()
+
+    floor_images.remove_old_pyramids(floor_id, keep_tiles_path=result["tiles_path"])
+    print(f"INFO: Derivatives ready for floor {floor_id} ({len(result['variants'])} variants)")
+
+def _swap_without_derivatives(floor_id: int, image_path: str):
+    # The new image cannot be rendered: show it plain rather than keep it pending forever
+    db = database.SessionLocal()
+    try:
+        floor = db.query(Floor).filter(Floor.id == floor_id).with_for_update().first()
+        if floor is None or floor.pending_image_path != image_path:
+            db.rollback()
+            return
+        replaced = _swap_pending(floor)
+        floor.tiles_path = floor.preview_path = floor.tile_min_zoom = None
+        db.query(FloorImageVariant).filter(FloorImageVariant.floor_id == floor_id).delete(synchronize_session=False)
+        versions.bump(db, versions.FLOORS)
+        db.commit()
+        if replaced != image_path:
+            delete_image_if_unused(db, replaced, floor_id)
+    except Exception as e:
+        db.rollback()
+        print(f"ERROR: Failed to switch floor {floor_id} to its new image: {e}")
+        return
+    finally:
+        db.close()
+    floor_images.remove_old_pyramids(floor_id)
+    print(f"WARNING: Floor {floor_id} switched to its new image without derivatives")
+
+def _scan_missing():
+    db = database.SessionLocal()
+    try:
+        # Floors whose derivatives were not rendered from their current image
+        current = db.query(FloorImageVariant.id).filter(
+            FloorImageVariant.floor_id == Floor.id,
+            FloorImageVariant.source_path == Floor.image_path
+        ).exists()
+        pending = db.query(Floor.id, Floor.image_path).filter(
+            Floor.pending_image_path.is_(None),
+            (Floor.tiles_path.is_(None)) | ~current
+        ).all()
+        # Replacement images still waiting for their derivatives
+        pending += db.query(Floor.id, Floor.pending_image_path).filter(Floor.pending_image_path.isnot(None)).all()
+    except Exception as e:
+        print(f"ERROR: Failed to look for floors without derivatives: {e}")
+        return
+    finally:
+        db.close()
+
+    for floor_id, image_path in pending:
+        if os.path.exists(_image_file(image_path)):
+            schedule(floor_id, image_path)
+        else:
+            print(f"WARNING: Image of floor {floor_id} not found at {image_path}, skipping derivatives.")
@@ -0,0 +1,66 @@
+import asyncio
+import os
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app import database
+from app.core.circuit_breaker import CLOSED
+
+OCS_PROBE_INTERVAL = int(os.getenv("OCS_PROBE_INTERVAL", "10"))
+
+def check_connections(local_db: Session, ocs_db: Session | None) -> dict:
+    """
+    Diagnose database connections.
+    Returns status for 'local' and 'ocs'.
+    """
+    status = {
+        "local": "UNKNOWN",
+        "ocs": "UNKNOWN"
+    }
+
+    # Check Local DB
+    try:
+        local_db.execute(text("SELECT 1"))
+        status["local"] = "OK"
+    except Exception as e:
+        status["local"] = f"ERROR: {str(e)}"
+
+    # Check OCS DB
+    if ocs_db is None and database.ocs_unavailable():
+        status["ocs"] = f"INDISPONÍVEL (circuit breaker aberto: {database.ocs_breaker.last_error})"
+    elif ocs_db is None:
+        status["ocs"] = "DESATIVADO (Engine não inicializada ou URL não configurada)"
+    else:
+        try:
+            # Try a real query to Hardware table (MySQL)
+            result = ocs_db.execute(text("SELECT count(*) FROM hardware")).scalar()
+            status["ocs"] = f"OK (Machines Found: {result})"
+        except Exception as e:
+            status["ocs"] = f"ERROR: Connection Failed. Details: {str(e)}"
+
+    return status
+
+def probe_ocs() -> bool:
+    """
+    One `SELECT 1` against OCS; the engine events report the outcome to the circuit breaker.
+    """
+    if database.engine_ocs is None:
+        return False
+    try:
+        with database.engine_ocs.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        print(f"WARNING: OCS probe failed: {e}")
+        return False
+
+async def run_ocs_probe():
+    """
+    Background job started with the app: while the OCS breaker is not closed, probes the
+    tunnel every OCS_PROBE_INTERVAL seconds so it closes again without waiting for a request.
+    """
+    if database.engine_ocs is None:
+        return
+    while True:
+        await asyncio.sleep(OCS_PROBE_INTERVAL)
+        if database.ocs_breaker.state != CLOSED and database.ocs_breaker.allow_request():
+            await asyncio.to_thread(probe_ocs)
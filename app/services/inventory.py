@@ -1,6 +1,70 @@
+import os
+import time
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from app import database
+from app.core.cache import SingleFlightCache, LRUCache
+from app.core.circuit_breaker import CircuitOpenError
 from app.models.node import NetworkNode
+from app.services import ocs_mirror, fetch_pool, reconcile, bindings
+
+def fetch_ocs_machines(local_db: Session, ocs_db: Session | None) -> list[dict] | None:
+    """
+    Active OCS machines (not tagged as inactive), from the local mirror while it is fresh,
+    live from OCS otherwise. None when neither is available; live query errors propagate.
+    """
+    if ocs_mirror.is_fresh(local_db):
+        return ocs_mirror.fetch_active_machines(local_db)
+    if ocs_db is None:
+        return None
+    return _fetch_live_machines(ocs_db)
+
+def _fetch_live_machines(ocs_db: Session) -> list[dict]:
+    # accountinfo might be named 'accountinfo' or similar, usually standard OCS is 'accountinfo'
+    query = text("""
+        SELECT h.ID, h.NAME, a.TAG, h.MEMORY, h.PROCESSORT, b.SMODEL, h.IPADDR, h.USERID, h.OSNAME, h.LASTDATE
+        FROM hardware h
+        LEFT JOIN accountinfo a ON h.ID = a.HARDWARE_ID
+        LEFT JOIN bios b ON h.ID = b.HARDWARE_ID
+        WHERE (a.TAG IS NULL OR (a.TAG NOT LIKE '%DESATIVADO%' AND a.TAG NOT LIKE '%DESATIVADA%' AND a.TAG NOT LIKE '%SERVIDORES%'))
+    """)
+    return [
+        {
+            "id": row[0], "name": row[1], "tag": row[2], "memory": row[3], "processor": row[4], "model": row[5],
+            "ip": row[6], "user": row[7], "os": row[8], "lastdate": row[9]
+        }
+        for row in ocs_db.execute(query).fetchall()
+    ]
+
+def fetch_with_ocs_machines(local_db: Session, ocs_db: Session | None, load_local):
+    """
+    Returns (load_local(local_db), OCS machines or None, OCS error or None).
+    When OCS is read live, its query runs on the fetch pool while load_local queries
+    Postgres, so the two overlap (see scripts/benchmark_concurrent_fetch.py).
+    """
+    if ocs_db is None or ocs_mirror.is_fresh(local_db):
+        # The mirror is read through local_db, which cannot be shared between threads
+        local = load_local(local_db)
+        try:
+            return local, fetch_ocs_machines(local_db, ocs_db), None
+        except Exception as e:
+            return local, None, e
+
+    future = fetch_pool.submit(_fetch_live_machines, ocs_db)
+    try:
+        local = load_local(local_db)
+    finally:
+        # Always wait: the caller closes ocs_db once we return
+        try:
+            machines, error = future.result(), None
+        except Exception as e:
+            machines, error = None, e
+    return local, machines, error
+
+def _load_local_computers(local_db: Session) -> tuple[list, dict[int, int]]:
+    # Computers and their OCS bindings (node id -> hardware id)
+    nodes = local_db.query(NetworkNode).filter(NetworkNode.type == 'Computador').all()
+    return nodes, bindings.hardware_ids_by_node(local_db)
 
 def get_inventory_discrepancies(local_db: Session, ocs_db: Session | None):
     """
@@ -8,61 +72,45 @@ def get_inventory_discrepancies(local_db: Session, ocs_db: Session | None):
     Returns:
         {
             "missing_in_ocs": [List of Nodes present in Map but not in OCS],
-            "missing_in_map": [List of OCS Machines present in OCS but not in Map]
+            "missing_in_map": [List of OCS Machines present in OCS but not in Map],
+            "suggestions": [Probable map/OCS pairs among both lists, see reconcile.suggest_matches]
         }
     """
     
-    # 1. Fetch Local Machines (Computers only)
+    # 1. Fetch Local Machines (Computers only) and 2. OCS Machines, concurrently
     # We ignore 'Ponto', 'Ramal', 'Equipamento'
-    local_nodes = local_db.query(NetworkNode).filter(NetworkNode.type == 'Computador').all()
+    (local_nodes, bound), machines, error = fetch_with_ocs_machines(local_db, ocs_db, _load_local_computers)
     
     # Store as a set of names for O(1) lookup
     # Normalize to upper case for case-insensitive comparison
     local_names = {node.name.upper(): node for node in local_nodes}
     
-    # 2. Fetch OCS Machines
     ocs_names = set()
     ocs_data = []
     
-    if ocs_db:
-        try:
-            # Query: Name and Tag from joined tables
-            # accountinfo might be named 'accountinfo' or similar, usually standard OCS is 'accountinfo'
-            query = text("""
-                SELECT h.NAME, a.TAG, h.MEMORY, h.PROCESSORT, b.SMODEL, h.IPADDR, h.USERID, h.OSNAME
-                FROM hardware h
-                LEFT JOIN accountinfo a ON h.ID = a.HARDWARE_ID
-                LEFT JOIN bios b ON h.ID = b.HARDWARE_ID
-                WHERE (a.TAG IS NULL OR (a.TAG NOT LIKE '%DESATIVADO%' AND a.TAG NOT LIKE '%DESATIVADA%' AND a.TAG NOT LIKE '%SERVIDORES%'))
-            """)
-            result = ocs_db.execute(query).fetchall()
-            
-            for row in result:
-                # row is (NAME, TAG, MEMORY, PROCESSORT, SMODEL, IPADDR, USERID, OSNAME)
-                name = str(row[0]).upper() if row[0] else ""
-                
-                if name:
-                    ocs_names.add(name)
-                    ocs_data.append({
-                        "name": name, 
-                        "tag": row[1],
-                        "memory": row[2],
-                        "processor": row[3],
-                        "model": row[4],
-                        "ip": row[5],
-                        "user": row[6],
-                        "os": row[7]
-                    })
-                    
-        except Exception as e:
-            print(f"ERROR: Failed to fetch OCS Inventory: {e}")
-            # If OCS fails, we can't determine what is missing in map, 
-            # but we can technically see what IS in map.
-            # However, the diff would be invalid.
-            return {"error": f"OCS Connection Failed: {str(e)}"}
-    else:
+    if error is not None:
+        print(f"ERROR: Failed to fetch OCS Inventory: {error}")
+        # If OCS fails, we can't determine what is missing in map, 
+        # but we can technically see what IS in map.
+        # However, the diff would be invalid.
+        return {"error": f"OCS Connection Failed: {str(error)}"}
+    if machines is None:
+        if database.ocs_unavailable():
+            return {"error": "OCS Database unavailable (circuit breaker open, retrying in background)"}
         return {"error": "OCS Database not configured"}
 
+    for machine in machines:
+        name = str(machine["name"]).upper() if machine["name"] else ""
+        if name:
+            ocs_names.add(name)
+            ocs_data.append({**machine, "name": name})
+
+    # Bound computers match by OCS hardware id, whatever the names are now
+    ocs_ids = {machine["id"] for machine in ocs_data}
+    node_ids = {node.id for node in local_nodes}
+    matched_nodes = {node_id for node_id, hardware_id in bound.items() if hardware_id in ocs_ids}
+    matched_ids = {hardware_id for node_id, hardware_id in bound.items() if node_id in node_ids}
+
     # 3. Calculate Discrepancies
     
     # A. Missing in OCS (Present in Local, but not in OCS)
@@ -70,7 +118,7 @@ def get_inventory_discrepancies(local_db: Session, ocs_db: Session | None):
     # Potential Ghost machines or incorrectly named.
     missing_in_ocs = []
     for name, node in local_names.items():
-        if name not in ocs_names:
+        if node.id not in matched_nodes and name not in ocs_names:
             missing_in_ocs.append({
                 "id": node.id,
                 "name": node.name,
@@ -83,7 +131,7 @@ def get_inventory_discrepancies(local_db: Session, ocs_db: Session | None):
     missing_in_map = []
     for ocs_machine in ocs_data:
         name = ocs_machine["name"]
-        if name not in local_names:
+        if ocs_machine["id"] not in matched_ids and name not in local_names:
             missing_in_map.append({
                 "name": name,
                 "tag": ocs_machine["tag"],
@@ -98,19 +146,61 @@ def get_inventory_discrepancies(local_db: Session, ocs_db: Session | None):
     # Sort for UI niceness
     missing_in_ocs.sort(key=lambda x: x["name"])
     missing_in_map.sort(key=lambda x: x["name"])
+
+    # C. Probable pairs among both lists ('RJ-PC01' on the map vs 'RJPC01' in OCS)
+    suggestions = reconcile.suggest_matches(
+        [(node["id"], node["name"]) for node in missing_in_ocs],
+        [machine["name"] for machine in missing_in_map]
+    )
+
+    # D. Unbound computers with the same name as an OCS machine (bound by POST /inventory/audit/bindings)
+    bindable = _name_matches(local_names, bound, machines)
     
     return {
         "status": "success",
         "missing_in_ocs": missing_in_ocs,
         "missing_in_map": missing_in_map,
+        "suggestions": suggestions,
+        "bindable": bindable,
         "counts": {
             "local_computers": len(local_names),
             "ocs_machines": len(ocs_names),
             "missing_in_ocs": len(missing_in_ocs),
-            "missing_in_map": len(missing_in_map)
+            "missing_in_map": len(missing_in_map),
+            "suggestions": len(suggestions),
+            "bound": len(bound),
+            "bindable": len(bindable)
         }
     }
 
+def _name_matches(local_names: dict, bound: dict[int, int], machines: list[dict]) -> list[dict]:
+    # {'node_id', 'hardware_id', 'ocs_name'} of unbound computers named like an OCS machine
+    ocs_by_name = {str(machine["name"]).upper(): machine for machine in machines if machine["name"]}
+    return [
+        {"node_id": node.id, "hardware_id": ocs_by_name[name]["id"], "ocs_name": ocs_by_name[name]["name"]}
+        for name, node in local_names.items()
+        if node.id not in bound and name in ocs_by_name
+    ]
+
+def bind_audit_matches(local_db: Session, ocs_db: Session | None) -> dict:
+    """
+    Binds every unbound computer to the OCS machine with the same name (the audit's
+    `bindable` list, recomputed now). Editors confirm the bindings later.
+    Returns {'bound': [matches recorded]} or {'error'} like the audit.
+    """
+    (local_nodes, bound), machines, error = fetch_with_ocs_machines(local_db, ocs_db, _load_local_computers)
+    if error is not None:
+        print(f"ERROR: Failed to fetch OCS Inventory: {error}")
+        return {"error": f"OCS Connection Failed: {str(error)}"}
+    if machines is None:
+        if database.ocs_unavailable():
+            return {"error": "OCS Database unavailable (circuit breaker open, retrying in background)"}
+        return {"error": "OCS Database not configured"}
+
+    matches = _name_matches({node.name.upper(): node for node in local_nodes}, bound, machines)
+    recorded = bindings.record_audit_matches(local_db, matches)
+    return {"status": "success", "bound": recorded}
+
 from datetime import datetime, timedelta
 
 def get_node_status_map(local_db: Session, ocs_db: Session | None):
@@ -122,52 +212,21 @@ def get_node_status_map(local_db: Session, ocs_db: Session | None):
     """
     status_map = {}
     
-    # 1. Fetch Local Computers
-    local_nodes = local_db.query(NetworkNode).filter(NetworkNode.type == 'Computador').all()
-    
-    # 2. Fetch OCS Data (Name + LastDate)
+    # 1. Fetch Local Computers and 2. OCS Data (Name + LastDate), concurrently
+    (local_nodes, bound), machines, error = fetch_with_ocs_machines(local_db, ocs_db, _load_local_computers)
     ocs_data = {} # Name -> LastDate (datetime)
+    ocs_by_id = {} # hardware id -> LastDate, for bound computers
     
-    if ocs_db:
-        try:
-            # We explicitly need LASTDATE from hardware table
-            query = text("""
-                SELECT h.NAME, h.LASTDATE
-                FROM hardware h
-                LEFT JOIN accountinfo a ON h.ID = a.HARDWARE_ID
-                WHERE (a.TAG IS NULL OR (a.TAG NOT LIKE '%DESATIVADO%' AND a.TAG NOT LIKE '%DESATIVADA%' AND a.TAG NOT LIKE '%SERVIDORES%'))
-            """)
-            result = ocs_db.execute(query).fetchall()
-            
-            for row in result:
-                name = str(row[0]).upper() if row[0] else ""
-                last_date_raw = row[1]
-                
-                # Parse OCS Date (Format usually: YYYY-MM-DD HH:MM:SS or similar)
-                # If it's already a datetime object (pymysql might convert), good.
-                # If string, parse it.
-                if isinstance(last_date_raw, str):
-                    try:
-                        last_date = datetime.strptime(last_date_raw, "%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        try:
-                            last_date = datetime.strptime(last_date_raw, "%Y-%m-%d")
-                        except:
-                            last_date = None
-                elif isinstance(last_date_raw, datetime):
-                    last_date = last_date_raw
-                else:
-                    last_date = None
-                    
-                if name:
-                    ocs_data[name] = last_date
-                    
-        except Exception as e:
-            print(f"ERROR: Status Map OCS Fetch failed: {e}")
-            # Fallback: All Red? Or just return empty?
-            # If OCS is down, everything is effectively "unknown", but "Red" implies "Missing".
-            # Let's verify existing nodes against an empty set -> All Red.
-            pass
+    if error is not None:
+        print(f"ERROR: Status Map OCS Fetch failed: {error}")
+        # If OCS is down, everything is effectively "unknown", but "Red" implies "Missing".
+        # Let's verify existing nodes against an empty set -> All Red.
+    for machine in machines or []:
+        name = str(machine["name"]).upper() if machine["name"] else ""
+        if name:
+            # Parse OCS Date (Format usually: YYYY-MM-DD HH:MM:SS or similar)
+            ocs_data[name] = ocs_mirror.parse_ocs_date(machine["lastdate"])
+        ocs_by_id[machine["id"]] = ocs_mirror.parse_ocs_date(machine["lastdate"])
             
     # 3. Determine Status
     try:
@@ -176,9 +235,10 @@ def get_node_status_map(local_db: Session, ocs_db: Session | None):
         
         for node in local_nodes:
             name_upper = node.name.upper()
+            hardware_id = bound.get(node.id)
             
-            if name_upper in ocs_data:
-                last_seen = ocs_data[name_upper]
+            if hardware_id in ocs_by_id or name_upper in ocs_data:
+                last_seen = ocs_by_id[hardware_id] if hardware_id in ocs_by_id else ocs_data[name_upper]
                 if last_seen and last_seen >= cutoff_active:
                     status_map[node.id] = "green" # Active
                 else:
@@ -195,3 +255,56 @@ def get_node_status_map(local_db: Session, ocs_db: Session | None):
         return {}
 
     return status_map
+
+def _load_status_map() -> dict:
+    local_db = database.SessionLocal()
+    ocs_db = database.ocs_session()
+    try:
+        if ocs_db is None and database.ocs_unavailable() and not ocs_mirror.is_fresh(local_db):
+            # Keep serving the cached map instead of replacing it with an all-red one
+            raise CircuitOpenError("OCS circuit breaker is open")
+        return get_node_status_map(local_db, ocs_db)
+    finally:
+        local_db.close()
+        if ocs_db:
+            ocs_db.close()
+
+# Shared by /inventory/status, the SSE monitor and floor clusters: one OCS query per TTL
+# no matter how many tabs poll. Served stale (while one refresh runs) up to TTL + STALE.
+status_cache = SingleFlightCache(
+    _load_status_map,
+    ttl=int(os.getenv("STATUS_CACHE_TTL", "30")),
+    stale_ttl=int(os.getenv("STATUS_CACHE_STALE", "300")),
+    name="Status cache"
+)
+
+# All-red map served while the breaker is open and nothing is cached, rebuilt at most
+# once per TTL instead of querying Postgres on every poll of every tab
+_fallback_cache = LRUCache(maxsize=1, ttl=int(os.getenv("STATUS_FALLBACK_TTL", "10")))
+
+def invalidate_status():
+    """
+    Drops the cached status maps; call after computers are added, renamed, deleted or rebound.
+    """
+    status_cache.invalidate()
+    _fallback_cache.invalidate()
+
+def get_cached_status_map() -> tuple[dict, float]:
+    """
+    (NodeID -> color, age in seconds) from the shared status cache.
+    With OCS unavailable and nothing cached, every computer is reported missing (red).
+    """
+    try:
+        return status_cache.get()
+    except CircuitOpenError:
+        cached = _fallback_cache.get("status")
+        if cached is not None:
+            status_map, built_at = cached
+            return status_map, time.monotonic() - built_at
+        local_db = database.SessionLocal()
+        try:
+            status_map = get_node_status_map(local_db, None)
+        finally:
+            local_db.close()
+        _fallback_cache.set("status", (status_map, time.monotonic()))
+        return status_map, 0.0
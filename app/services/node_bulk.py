@@ -0,0 +1,186 @@
+import csv
+import io
+import os
+import time
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app.models.node import NetworkNode
+from app.models.floor import Floor
+from app.schemas.node import NodeCreate, NodeBulkUpdate
+from app.services import changes
+
+# Columns expected in CSV/XLSX imports (header row), same names as NodeCreate
+IMPORT_COLUMNS = list(NodeCreate.model_fields)
+
+def _clean_row(row: dict) -> dict:
+    """
+    Drops unnamed columns and turns empty cells into None so optional fields validate.
+    """
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                value = None
+        cleaned[str(key).strip()] = value
+    return cleaned
+
+def parse_upload(filename: str, content: bytes) -> list[dict]:
+    """
+    Reads a CSV (',' or ';' separated, UTF-8) or XLSX file into row dicts keyed by the header row.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+
+    if ext == ".csv":
+        text = content.decode("utf-8-sig")
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;")
+        except csv.Error:
+            dialect = csv.excel
+        return [_clean_row(row) for row in csv.DictReader(io.StringIO(text), dialect=dialect)]
+
+    if ext in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Invalid XLSX file: {e}")
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                return []
+            return [
+                _clean_row(dict(zip(header, values)))
+                for values in rows
+                if any(v is not None for v in values)
+            ]
+        finally:
+            workbook.close()
+
+    raise ValueError(f"Unsupported file type '{ext}'. Use .csv or .xlsx")
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in error.errors())
+
+def apply_batch(db: Session, create_rows: list[dict], update_rows: list[dict], delete_ids: list[int]) -> dict:
+    """
+    Validates every row, then writes all valid rows in a single transaction
+    (multi-row INSERT ... RETURNING, bulk UPDATE by primary key, one DELETE).
+    Invalid rows are reported per row and skipped; a database error rolls back the whole batch.
+    """
+    started = time.perf_counter()
+    results = []
+
+    # 1. Validate
+    creates = []
+    for index, row in enumerate(create_rows):
+        try:
+            creates.append((index, NodeCreate.model_validate(row)))
+        except ValidationError as e:
+            results.append({"op": "create", "index": index, "status": "error", "error": _validation_message(e)})
+
+    updates = []
+    for index, row in enumerate(update_rows):
+        try:
+            updates.append((index, NodeBulkUpdate.model_validate(row)))
+        except ValidationError as e:
+            results.append({"op": "update", "index": index, "status": "error", "error": _validation_message(e)})
+
+    # 2. Check references with one query each (instead of letting the FK abort the batch)
+    floor_ids = {n.floor_id for _, n in creates} | {n.floor_id for _, n in updates if n.floor_id is not None}
+    known_floors = {row[0] for row in db.query(Floor.id).filter(Floor.id.in_(floor_ids))} if floor_ids else set()
+
+    target_ids = {n.id for _, n in updates} | set(delete_ids)
+    existing = dict(db.query(NetworkNode.id, NetworkNode.floor_id).filter(NetworkNode.id.in_(target_ids))) if target_ids else {}
+
+    create_values, create_index = [], []
+    for index, node in creates:
+        if node.floor_id not in known_floors:
+            results.append({"op": "create", "index": index, "status": "error", "error": f"floor_id {node.floor_id} not found"})
+            continue
+        create_values.append({
+            "name": node.name,
+            "type": node.type,
+            "ip_address": node.ip_address,
+            "point_number": node.point_number,
+            "assigned_to": node.assigned_to,
+            "details": node.details,
+            "floor_id": node.floor_id,
+            "geom": f"POINT({node.x} {node.y})"
+        })
+        create_index.append(index)
+
+    update_values, update_touched = [], []
+    for index, node in updates:
+        if node.id not in existing:
+            results.append({"op": "update", "index": index, "status": "error", "error": f"node {node.id} not found"})
+            continue
+        if node.floor_id is not None and node.floor_id not in known_floors:
+            results.append({"op": "update", "index": index, "status": "error", "error": f"floor_id {node.floor_id} not found"})
+            continue
+        values = node.model_dump(exclude_none=True, exclude={"x", "y"})
+        if node.x is not None and node.y is not None:
+            values["geom"] = f"POINT({node.x} {node.y})"
+        if values.keys() == {"id"}:
+            # Nothing to set: an UPDATE with an empty SET clause would abort the batch
+            results.append({"op": "update", "index": index, "status": "unchanged", "id": node.id})
+            continue
+        update_values.append(values)
+        update_touched.append((node.id, existing[node.id]))
+        if node.floor_id is not None and node.floor_id != existing[node.id]:
+            update_touched.append((node.id, node.floor_id))
+        results.append({"op": "update", "index": index, "status": "updated", "id": node.id})
+
+    delete_found = []
+    for index, node_id in enumerate(delete_ids):
+        if node_id not in existing:
+            results.append({"op": "delete", "index": index, "status": "error", "error": f"node {node_id} not found"})
+            continue
+        delete_found.append(node_id)
+        results.append({"op": "delete", "index": index, "status": "deleted", "id": node_id})
+
+    # 3. Write everything in one transaction
+    try:
+        if create_values:
+            inserted = db.execute(
+                insert(NetworkNode).returning(NetworkNode.id, NetworkNode.floor_id, sort_by_parameter_order=True),
+                create_values
+            ).all()
+            changes.record(db, changes.INSERT, [(row.id, row.floor_id) for row in inserted])
+            for index, row in zip(create_index, inserted):
+                results.append({"op": "create", "index": index, "status": "created", "id": row.id})
+        if update_values:
+            db.execute(update(NetworkNode), update_values)
+            changes.record(db, changes.UPDATE, update_touched)
+        if delete_found:
+            db.query(NetworkNode).filter(NetworkNode.id.in_(delete_found)).delete(synchronize_session=False)
+            changes.record(db, changes.DELETE, [(node_id, existing[node_id]) for node_id in delete_found])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    written = len(create_values) + len(update_values) + len(delete_found)
+    results.sort(key=lambda r: (r["op"], r["index"]))
+
+    return {
+        "status": "success",
+        "results": results,
+        "counts": {
+            "created": len(create_values),
+            "updated": len(update_values),
+            "deleted": len(delete_found),
+            "unchanged": sum(1 for r in results if r["status"] == "unchanged"),
+            "errors": sum(1 for r in results if r["status"] == "error")
+        },
+        "throughput": {
+            "rows": written,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "rows_per_second": round(written / elapsed, 1) if elapsed > 0 else None
+        }
+    }
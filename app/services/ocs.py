@@ -1,18 +1,47 @@
+import base64
+import os
+import orjson
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from typing import Optional
+from datetime import datetime
+from app import database
+from app.core.cache import LRUCache
+from app.services import ocs_mirror, bindings
 
-def get_machine_by_name(db: Session, name: str) -> Optional[dict]:
+# UPPER(hostname) -> machine details (same dict as get_machine_by_name). Unknown machines are not cached.
+machine_cache = LRUCache(
+    maxsize=int(os.getenv("MACHINE_CACHE_SIZE", "2000")),
+    ttl=int(os.getenv("MACHINE_CACHE_TTL", "300"))
+)
+# Top softwares listed in machine details
+SOFTWARE_LIMIT = 5
+
+def get_machine_by_name(db: Session, name: str, local_db: Session | None = None) -> Optional[dict]:
     """
     Query OCS 'hardware' table for machine details.
+    Answered from the local mirror when local_db is given and the mirror is fresh.
+    """
+    if local_db is not None and ocs_mirror.is_fresh(local_db):
+        return ocs_mirror.get_machine_by_name(local_db, name)
+    return _get_machine(db, "h.NAME = :key", name)
+
+def get_machine_by_id(db: Session, hardware_id: int, local_db: Session | None = None) -> Optional[dict]:
     """
+    get_machine_by_name by OCS primary key (bound nodes, see NodeOcsBinding).
+    """
+    if local_db is not None and ocs_mirror.is_fresh(local_db):
+        return ocs_mirror.get_machine_by_id(local_db, hardware_id)
+    return _get_machine(db, "h.ID = :key", hardware_id)
+
+def _get_machine(db: Session, condition: str, key) -> Optional[dict]:
     if db is None:
         return None
 
     # OCS table 'hardware' usually contains: ID, NAME, WORKGROUP, OSNAME, IPADDR, LASTDATE/LASTCOME
     # We join with 'bios' to get the Model (SMODEL)
     # We prioritize IP from 'networks' table where IP starts with 10.20.
-    query = text("""
+    query = text(f"""
         SELECT h.ID, h.NAME, h.WORKGROUP, h.OSNAME, h.LASTDATE, h.USERID, h.MEMORY, h.PROCESSORT as PROCESSOR, b.SMODEL as MODEL,
         (SELECT SUM(DISKSIZE) FROM storages WHERE HARDWARE_ID = h.ID) as DISKSIZE,
         COALESCE(
@@ -21,12 +50,12 @@ def get_machine_by_name(db: Session, name: str) -> Optional[dict]:
         ) as IPADDR
         FROM hardware h
         LEFT JOIN bios b ON h.ID = b.HARDWARE_ID
-        WHERE h.NAME = :name
+        WHERE {condition}
         LIMIT 1
     """)
     
     try:
-        result = db.execute(query, {"name": name}).mappings().first()
+        result = db.execute(query, {"key": key}).mappings().first()
         if result:
             data = dict(result)
             # Fetch Top 5 Softwares for Compliance/Check
@@ -52,29 +81,348 @@ def get_machine_by_name(db: Session, name: str) -> Optional[dict]:
         print(f"Error querying OCS: {e}")
         return None
 
-def search_machines_by_software(db: Session, software_name: str) -> list[dict]:
+# Names / ids per IN (...) list in batched lookups
+BATCH_SIZE = 500
+# Branches per UNION ALL statement in per-key limited lookups
+UNION_BATCH_SIZE = 100
+
+def _limited_union(branch: str, order_by: str, count: int):
     """
-    Find all machines that have a software matching the query.
-    Returns: [{'hostname': 'PC-01', 'name': 'Chrome', 'version': '120.0'}]
+    UNION ALL of `count` copies of the branch query, parameters suffixed by branch number
+    (':id_{i}'), ordered by order_by. Each branch keeps its own ORDER BY ... LIMIT, so the
+    per-key cap is applied by the OCS server (MySQL 5.x has no window functions).
     """
-    if db is None:
-        return []
+    branches = [f"SELECT * FROM ({branch.format(i=i)}) AS b{i}" for i in range(count)]
+    return text("\nUNION ALL\n".join(branches) + f"\nORDER BY {order_by}")
+
+def _prefer_latest(machines: dict, data: dict):
+    # Duplicate hostnames in OCS: keep the most recently inventoried machine
+    key = str(data["NAME"]).upper()
+    current = machines.get(key)
+    if current is None or _last_seen(data) > _last_seen(current):
+        machines[key] = data
+
+def _last_seen(data: dict) -> datetime:
+    return ocs_mirror.parse_ocs_date(data["LASTDATE"]) or datetime.min
+
+def get_machines_by_names(db: Session, names: list[str], local_db: Session | None = None) -> dict[str, dict]:
+    """
+    Batched get_machine_by_name (without softwares) for many hostnames:
+    three set-based queries per BATCH_SIZE names instead of three per machine.
+    Returns {UPPER(hostname): machine}; unknown names are absent.
+    """
+    if local_db is not None and ocs_mirror.is_fresh(local_db):
+        return ocs_mirror.get_machines_by_names(local_db, names)
+    if db is None or not names:
+        return {}
+
+    machines = {}
+    try:
+        for batch in _get_machines(db, "h.NAME IN :keys", sorted({name for name in names if name})):
+            for data in batch.values():
+                _prefer_latest(machines, data)
+    except Exception as e:
+        print(f"Error querying OCS: {e}")
+        return {}
+    return machines
+
+def get_machines_by_ids(db: Session, ids: list[int], local_db: Session | None = None) -> dict[int, dict]:
+    """
+    get_machines_by_names by OCS primary key: {hardware id: machine}.
+    """
+    if local_db is not None and ocs_mirror.is_fresh(local_db):
+        return ocs_mirror.get_machines_by_ids(local_db, ids)
+    if db is None or not ids:
+        return {}
+
+    machines = {}
+    try:
+        for batch in _get_machines(db, "h.ID IN :keys", sorted(set(ids))):
+            machines.update(batch)
+    except Exception as e:
+        print(f"Error querying OCS: {e}")
+        return {}
+    return machines
+
+def _get_machines(db: Session, condition: str, keys: list):
+    """
+    Yields {hardware id: machine} per BATCH_SIZE keys (hardware+bios, then disks and IPs by id).
+    """
+    hardware_query = text(f"""
+        SELECT h.ID, h.NAME, h.WORKGROUP, h.OSNAME, h.LASTDATE, h.USERID, h.MEMORY, h.PROCESSORT as PROCESSOR,
+        b.SMODEL as MODEL, h.IPADDR
+        FROM hardware h
+        LEFT JOIN bios b ON h.ID = b.HARDWARE_ID
+        WHERE {condition}
+    """).bindparams(bindparam("keys", expanding=True))
+    disk_query = text("""
+        SELECT HARDWARE_ID, SUM(DISKSIZE) as DISKSIZE FROM storages
+        WHERE HARDWARE_ID IN :ids
+        GROUP BY HARDWARE_ID
+    """).bindparams(bindparam("ids", expanding=True))
+    ip_query = text("""
+        SELECT HARDWARE_ID, IPADDRESS FROM networks
+        WHERE HARDWARE_ID IN :ids AND IPADDRESS LIKE '10.20.%'
+        ORDER BY HARDWARE_ID, ID
+    """).bindparams(bindparam("ids", expanding=True))
 
-    query = text("""
-        SELECT DISTINCT h.NAME as hostname, h.WORKGROUP as workgroup, n.NAME as software, v.VERSION as version
-        FROM hardware h 
-        JOIN software s ON h.ID = s.HARDWARE_ID 
+    for start in range(0, len(keys), BATCH_SIZE):
+        by_id = {}
+        for row in db.execute(hardware_query, {"keys": keys[start:start + BATCH_SIZE]}).mappings():
+            data = dict(row)
+            data["DISKSIZE"] = None
+            by_id[data["ID"]] = data
+        if not by_id:
+            continue
+
+        ids = list(by_id)
+        for row in db.execute(disk_query, {"ids": ids}):
+            by_id[row[0]]["DISKSIZE"] = row[1]
+        # Same preference as get_machine_by_name: first 10.20.x address, hardware.IPADDR otherwise
+        preferred = {}
+        for row in db.execute(ip_query, {"ids": ids}):
+            preferred.setdefault(row[0], row[1])
+        for hardware_id, ip in preferred.items():
+            by_id[hardware_id]["IPADDR"] = ip
+        yield by_id
+
+def get_softwares_by_ids(db: Session, ids: list[int], limit: int = SOFTWARE_LIMIT) -> dict[int, list[dict]]:
+    """
+    Batched version of the top softwares query of get_machine_by_name:
+    {hardware id: [{'NAME', 'VERSION'}, ...]} with the first `limit` names of each machine.
+    Only `limit` rows per machine cross the tunnel.
+    """
+    branch = f"""
+        SELECT s.HARDWARE_ID, n.NAME, v.VERSION
+        FROM software s
         JOIN software_name n ON s.NAME_ID = n.ID
         LEFT JOIN software_version v ON s.VERSION_ID = v.ID
-        WHERE n.NAME LIKE :software
-        ORDER BY h.NAME ASC
+        WHERE s.HARDWARE_ID = :id_{{i}}
+        AND n.NAME NOT LIKE 'Update for %'
+        AND n.NAME NOT LIKE 'Security Update %'
+        AND n.NAME NOT LIKE 'Hotfix %'
+        ORDER BY n.NAME ASC
+        LIMIT {int(limit)}
+    """
+
+    softwares = {}
+    for start in range(0, len(ids), UNION_BATCH_SIZE):
+        batch = ids[start:start + UNION_BATCH_SIZE]
+        query = _limited_union(branch, "HARDWARE_ID, NAME", len(batch))
+        for row in db.execute(query, {f"id_{i}": hardware_id for i, hardware_id in enumerate(batch)}):
+            softwares.setdefault(row[0], []).append({"NAME": row[1], "VERSION": row[2]})
+    return softwares
+
+def get_machines_for_names(db: Session, names: list[str], local_db: Session | None = None) -> dict[str, dict]:
+    """
+    get_machines_by_names, except that computers bound to an OCS machine are resolved by
+    hardware id (correct across renames). Needs local_db for the bindings.
+    """
+    bound = bindings.hardware_ids_by_name(local_db, names) if local_db is not None else {}
+    machines = {}
+    if bound:
+        by_id = get_machines_by_ids(db, list(bound.values()), local_db=local_db)
+        for key, hardware_id in bound.items():
+            if hardware_id in by_id:
+                machines[key] = by_id[hardware_id]
+    # Unbound names, and bindings whose machine is gone from OCS
+    rest = [name for name in names if name and name.upper() not in machines]
+    if rest:
+        machines.update(get_machines_by_names(db, rest, local_db=local_db))
+    return machines
+
+def get_machines_details_by_names(db: Session, names: list[str], local_db: Session | None = None) -> dict[str, dict]:
+    """
+    Full machine details (get_machine_by_name shape, softwares included) for many hostnames.
+    Computers bound to an OCS machine (NodeOcsBinding) are looked up by hardware id.
+    """
+    machines = get_machines_for_names(db, names, local_db=local_db)
+    if not machines:
+        return {}
+    ids = [machine["ID"] for machine in machines.values()]
+    try:
+        if local_db is not None and ocs_mirror.is_fresh(local_db):
+            softwares = ocs_mirror.get_softwares_by_ids(local_db, ids, SOFTWARE_LIMIT)
+        else:
+            softwares = get_softwares_by_ids(db, ids)
+    except Exception as e:
+        print(f"Error querying OCS: {e}")
+        return {}
+    for machine in machines.values():
+        machine["softwares"] = softwares.get(machine["ID"], [])
+    return machines
+
+def get_machine_cached(db: Session, name: str, local_db: Session | None = None) -> tuple[Optional[dict], bool]:
+    """
+    get_machine_by_name (by hardware id for bound computers) through machine_cache.
+    Returns (machine, cache hit).
+    """
+    key = name.upper()
+    machine = machine_cache.get(key)
+    if machine is not None:
+        return machine, True
+    hardware_id = bindings.hardware_ids_by_name(local_db, [name]).get(key) if local_db is not None else None
+    machine = get_machine_by_id(db, hardware_id, local_db=local_db) if hardware_id is not None else None
+    if machine is None:
+        machine = get_machine_by_name(db, name, local_db=local_db)
+    if machine is not None:
+        machine_cache.set(key, machine)
+    return machine, False
+
+def get_machines_cached(db: Session, names: list[str], local_db: Session | None = None) -> tuple[dict[str, dict], int]:
+    """
+    Batched get_machine_cached: cached machines are served from machine_cache and the rest
+    is loaded with one get_machines_details_by_names call (and cached).
+    Returns ({UPPER(hostname): machine}, cache hits); unknown names are absent.
+    """
+    machines = {}
+    missing = {}
+    for name in names:
+        if not name or name.upper() in machines or name.upper() in missing:
+            continue
+        machine = machine_cache.get(name.upper())
+        if machine is not None:
+            machines[name.upper()] = machine
+        else:
+            missing[name.upper()] = name
+    hits = len(machines)
+    if missing:
+        loaded = get_machines_details_by_names(db, list(missing.values()), local_db=local_db)
+        for key, machine in loaded.items():
+            machine_cache.set(key, machine)
+        machines.update(loaded)
+    return machines, hits
+
+def prefetch_machines(names: list[str]) -> int:
+    """
+    Loads the details of every machine not cached yet in one batch (own sessions:
+    runs as a background task). Returns how many machines were cached.
+    """
+    missing = [name for name in {n for n in names if n} if name.upper() not in machine_cache]
+    if not missing:
+        return 0
+    local_db = database.SessionLocal()
+    ocs_db = database.ocs_session()
+    try:
+        machines = get_machines_details_by_names(ocs_db, missing, local_db=local_db)
+    finally:
+        local_db.close()
+        if ocs_db:
+            ocs_db.close()
+    for key, machine in machines.items():
+        machine_cache.set(key, machine)
+    return len(machines)
+
+# Software groups per search page
+SOFTWARE_PAGE_SIZE = 50
+# Hostnames listed per software group (the group's 'machines' is the full count)
+SOFTWARE_GROUP_HOSTNAMES = int(os.getenv("SOFTWARE_GROUP_HOSTNAMES", "100"))
+SOFTWARE_GROUP_HOSTNAMES_MAX = 5000
+
+def _like_pattern(q: str, prefix: bool) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix else f"%{escaped}%"
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(list(key))).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Keyset of the last group of the previous page: (software, name_id, version_key).
+    Raises ValueError for a malformed cursor.
+    """
+    try:
+        software, name_id, version_key = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(software, str) or not isinstance(name_id, int) or not isinstance(version_key, int):
+        raise ValueError("Invalid cursor")
+    return software, name_id, version_key
+
+def _search_software_groups(db: Session, pattern: str, after: tuple | None, limit: int) -> list[tuple]:
+    keyset = "AND (n.NAME, s.NAME_ID, COALESCE(s.VERSION_ID, -1)) > (:after_name, :after_id, :after_version)" if after else ""
+    query = text(f"""
+        SELECT n.NAME, s.NAME_ID, COALESCE(s.VERSION_ID, -1) as VERSION_KEY, v.VERSION, COUNT(DISTINCT s.HARDWARE_ID) as MACHINES
+        FROM software_name n
+        JOIN software s ON s.NAME_ID = n.ID
+        LEFT JOIN software_version v ON s.VERSION_ID = v.ID
+        WHERE n.NAME LIKE :pattern {keyset}
+        GROUP BY n.NAME, s.NAME_ID, COALESCE(s.VERSION_ID, -1), v.VERSION
+        ORDER BY n.NAME, s.NAME_ID, VERSION_KEY
+        LIMIT :limit
     """)
-    
+    params = {"pattern": pattern, "limit": limit}
+    if after:
+        params.update(after_name=after[0], after_id=after[1], after_version=after[2])
+    return [tuple(row) for row in db.execute(query, params)]
+
+def _get_software_hostnames(db: Session, groups: list[tuple[int, int]], per_group: int) -> list[tuple]:
+    # One branch per (name_id, version_key) group, each capped by its own LIMIT on the server
+    if per_group <= 0:
+        return []
+    branch = f"""
+        SELECT DISTINCT s.NAME_ID, COALESCE(s.VERSION_ID, -1) AS VERSION_KEY, h.NAME AS HOSTNAME
+        FROM software s
+        JOIN hardware h ON h.ID = s.HARDWARE_ID
+        WHERE s.NAME_ID = :name_{{i}}
+        AND (s.VERSION_ID = :version_{{i}} OR (:version_{{i}} = -1 AND s.VERSION_ID IS NULL))
+        ORDER BY h.NAME ASC
+        LIMIT {int(per_group)}
+    """
+    rows = []
+    for start in range(0, len(groups), UNION_BATCH_SIZE):
+        batch = groups[start:start + UNION_BATCH_SIZE]
+        params = {}
+        for i, (name_id, version_key) in enumerate(batch):
+            params[f"name_{i}"] = name_id
+            params[f"version_{i}"] = version_key
+        query = _limited_union(branch, "HOSTNAME", len(batch))
+        rows.extend(tuple(row) for row in db.execute(query, params))
+    return rows
+
+def search_software(
+    db: Session, q: str, prefix: bool = False, after: tuple | None = None,
+    limit: int = SOFTWARE_PAGE_SIZE, local_db: Session | None = None,
+    hostnames_limit: int = SOFTWARE_GROUP_HOSTNAMES
+) -> dict:
+    """
+    Machines with a software whose name contains (or, with prefix, starts with) q, grouped by
+    software and version and paginated by keyset (software, name_id, version):
+    {'groups': [{'software', 'version', 'name_id', 'version_id', 'machines', 'hostnames',
+    'hostnames_truncated'}], 'next_cursor'}.
+    Each group lists at most hostnames_limit hostnames (first by name); 'machines' is the full count.
+    Answered from the mirror (trigram index) when fresh, from OCS otherwise.
+    """
+    pattern = _like_pattern(q, prefix)
+    if local_db is not None and ocs_mirror.is_fresh(local_db):
+        source, fetch_groups, fetch_hostnames = local_db, ocs_mirror.search_software_groups, ocs_mirror.get_software_hostnames
+    elif db is not None:
+        source, fetch_groups, fetch_hostnames = db, _search_software_groups, _get_software_hostnames
+    else:
+        return {"groups": [], "next_cursor": None}
+
     try:
-        # We use wildcards for partial match
-        search_term = f"%{software_name}%"
-        results = db.execute(query, {"software": search_term}).mappings().all()
-        return [dict(row) for row in results]
+        rows = fetch_groups(source, pattern, after, limit + 1)
+        page = rows[:limit]
+        hostnames = {}
+        if page:
+            for name_id, version_key, hostname in fetch_hostnames(source, [(row[1], row[2]) for row in page], hostnames_limit):
+                hostnames.setdefault((name_id, version_key), []).append(hostname)
     except Exception as e:
         print(f"Error searching software: {e}")
-        return []
+        return {"groups": [], "next_cursor": None}
+
+    groups = []
+    for software, name_id, version_key, version, machines in page:
+        names = hostnames.get((name_id, version_key), [])
+        groups.append({
+            "software": software,
+            "version": version,
+            "name_id": name_id,
+            "version_id": None if version_key == -1 else version_key,
+            "machines": machines,
+            "hostnames": names,
+            "hostnames_truncated": len(names) >= hostnames_limit and machines > len(names)
+        })
+    next_cursor = encode_cursor(page[-1][:3]) if len(rows) > limit else None
+    return {"groups": groups, "next_cursor": next_cursor}
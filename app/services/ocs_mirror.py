@@ -0,0 +1,470 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam, func, or_, and_, delete, distinct, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app import database
+from app.core.cache import LRUCache
+from app.models.ocs_mirror import (
+    OcsHardware, OcsAccountInfo, OcsBios, OcsStorage, OcsNetwork,
+    OcsSoftware, OcsSoftwareName, OcsSoftwareVersion, OcsSyncState
+)
+
+# Seconds between syncs (0 disables the background job)
+SYNC_INTERVAL = int(os.getenv("OCS_MIRROR_INTERVAL", "300"))
+# Reads use the mirror only if the last successful sync is at most this old (0 = always live)
+MAX_AGE = int(os.getenv("OCS_MIRROR_MAX_AGE", "900"))
+# Full resync (catches edits that do not touch LASTDATE) at least this often
+FULL_SYNC_INTERVAL = int(os.getenv("OCS_MIRROR_FULL_SYNC_INTERVAL", str(24 * 3600)))
+CHUNK_SIZE = 500 # Hardware ids per child-table query
+# Seconds is_fresh() trusts the last read of last_sync_at (many checks per request, one query)
+STATE_CACHE_TTL = int(os.getenv("OCS_MIRROR_STATE_CACHE_TTL", "5"))
+
+SYNC_STATE = "hardware"
+# Machines with these tags are not part of the inventory (same rule as the live queries)
+INACTIVE_TAGS = ("%DESATIVADO%", "%DESATIVADA%", "%SERVIDORES%")
+SOFTWARE_NOISE = ("Update for %", "Security Update %", "Hotfix %")
+
+def parse_ocs_date(value) -> datetime | None:
+    """
+    OCS dates arrive as datetime, as 'YYYY-MM-DD[ HH:MM:SS]' strings or as invalid zero dates.
+    """
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+    return None
+
+def _chunks(items: list, size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _by_ids(ocs_db: Session, sql: str, ids: list[int]):
+    query = text(sql).bindparams(bindparam("ids", expanding=True))
+    return ocs_db.execute(query, {"ids": ids}).mappings().all()
+
+def _upsert(db: Session, model, rows: list[dict]):
+    if not rows:
+        return
+    stmt = pg_insert(model)
+    keys = [c.name for c in model.__table__.primary_key.columns]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: stmt.excluded[name] for name in rows[0] if name not in keys}
+    )
+    for chunk in _chunks(rows, 5000):
+        db.execute(stmt, chunk)
+
+def _sync_children(local_db: Session, ocs_db: Session, ids: list[int]):
+    """
+    Replaces bios/storages/networks/software rows of the given machines.
+    """
+    bios = _by_ids(ocs_db, "SELECT HARDWARE_ID, SMODEL FROM bios WHERE HARDWARE_ID IN :ids", ids)
+    storages = _by_ids(ocs_db, "SELECT ID, HARDWARE_ID, DISKSIZE FROM storages WHERE HARDWARE_ID IN :ids", ids)
+    networks = _by_ids(ocs_db, "SELECT ID, HARDWARE_ID, IPADDRESS FROM networks WHERE HARDWARE_ID IN :ids", ids)
+    software = _by_ids(ocs_db, "SELECT ID, HARDWARE_ID, NAME_ID, VERSION_ID FROM software WHERE HARDWARE_ID IN :ids", ids)
+
+    for model in (OcsBios, OcsStorage, OcsNetwork, OcsSoftware):
+        local_db.execute(delete(model).where(model.hardware_id.in_(ids)))
+
+    if bios:
+        local_db.execute(pg_insert(OcsBios), [{"hardware_id": r["HARDWARE_ID"], "smodel": r["SMODEL"]} for r in bios])
+    if storages:
+        local_db.execute(pg_insert(OcsStorage), [
+            {"id": r["ID"], "hardware_id": r["HARDWARE_ID"], "disksize": r["DISKSIZE"]} for r in storages
+        ])
+    if networks:
+        local_db.execute(pg_insert(OcsNetwork), [
+            {"id": r["ID"], "hardware_id": r["HARDWARE_ID"], "ipaddress": r["IPADDRESS"]} for r in networks
+        ])
+    if software:
+        local_db.execute(pg_insert(OcsSoftware), [
+            {"id": r["ID"], "hardware_id": r["HARDWARE_ID"], "name_id": r["NAME_ID"], "version_id": r["VERSION_ID"]}
+            for r in software
+        ])
+
+def _sync_dimension(local_db: Session, ocs_db: Session, model, ocs_table: str, ocs_column: str, column: str, full: bool):
+    """
+    software_name / software_version only grow in OCS: copy new ids (all of them on a full sync).
+    """
+    since = 0 if full else (local_db.query(func.max(model.id)).scalar() or 0)
+    rows = ocs_db.execute(text(f"SELECT ID, {ocs_column} FROM {ocs_table} WHERE ID > :since"), {"since": since}).all()
+    _upsert(local_db, model, [{"id": r[0], column: r[1]} for r in rows])
+
+# One sync at a time (background loop and POST /ocs/mirror/sync): overlapping rounds
+# rewrite the same child rows and fail on unique violations or deadlocks
+_sync_lock = threading.Lock()
+
+def sync(full: bool = False) -> dict:
+    """
+    Copies OCS machines inventoried since the last watermark (hardware.LASTDATE) and their
+    bios/storages/networks/software rows into the local mirror, in one local transaction.
+    Returns {'status': 'running'} without syncing while another sync is in progress.
+    Blocking: run from a worker thread.
+    """
+    if database.SessionOCS is None:
+        return {"status": "disabled"}
+    if not _sync_lock.acquire(blocking=False):
+        return {"status": "running"}
+    try:
+        return _sync(full)
+    finally:
+        _sync_lock.release()
+
+def _sync(full: bool) -> dict:
+    ocs_db = database.ocs_session()
+    if ocs_db is None:
+        # Circuit breaker open: keep serving the current copy, retry on the next round
+        return {"status": "unavailable", "breaker": database.ocs_breaker.to_dict()}
+
+    started = time.perf_counter()
+    local_db = database.SessionLocal()
+    try:
+        state = local_db.get(OcsSyncState, SYNC_STATE)
+        if state is None:
+            state = OcsSyncState(name=SYNC_STATE)
+            local_db.add(state)
+        now = datetime.now()
+        full = full or state.watermark is None or state.last_full_sync_at is None \
+            or state.last_full_sync_at < now - timedelta(seconds=FULL_SYNC_INTERVAL)
+
+        # 1. Machines inventoried since the watermark (>=: rows sharing the last second are re-read)
+        query = "SELECT ID, NAME, WORKGROUP, OSNAME, IPADDR, USERID, MEMORY, PROCESSORT, LASTDATE, LASTCOME FROM hardware"
+        params = {}
+        if not full:
+            query += " WHERE LASTDATE >= :since"
+            params["since"] = state.watermark
+        hardware = [
+            {
+                "id": r["ID"], "name": r["NAME"], "workgroup": r["WORKGROUP"], "osname": r["OSNAME"],
+                "ipaddr": r["IPADDR"], "userid": r["USERID"], "memory": r["MEMORY"], "processort": r["PROCESSORT"],
+                "lastdate": parse_ocs_date(r["LASTDATE"]), "lastcome": parse_ocs_date(r["LASTCOME"])
+            }
+            for r in ocs_db.execute(text(query), params).mappings()
+        ]
+        _upsert(local_db, OcsHardware, hardware)
+        for ids in _chunks([h["id"] for h in hardware]):
+            _sync_children(local_db, ocs_db, ids)
+
+        # 2. Software names/versions referenced by the new rows
+        _sync_dimension(local_db, ocs_db, OcsSoftwareName, "software_name", "NAME", "name", full)
+        _sync_dimension(local_db, ocs_db, OcsSoftwareVersion, "software_version", "VERSION", "version", full)
+
+        # 3. Tags are edited in the OCS console without touching LASTDATE: one small table, copied whole
+        tags = ocs_db.execute(text("SELECT HARDWARE_ID, TAG FROM accountinfo")).all()
+        local_db.execute(delete(OcsAccountInfo))
+        if tags:
+            local_db.execute(pg_insert(OcsAccountInfo), [{"hardware_id": r[0], "tag": r[1]} for r in tags])
+
+        # 4. Machines deleted from OCS
+        live_ids = {row[0] for row in ocs_db.execute(text("SELECT ID FROM hardware"))}
+        removed = [row[0] for row in local_db.query(OcsHardware.id) if row[0] not in live_ids]
+        for ids in _chunks(removed):
+            for model in (OcsBios, OcsStorage, OcsNetwork, OcsSoftware):
+                local_db.execute(delete(model).where(model.hardware_id.in_(ids)))
+            local_db.execute(delete(OcsHardware).where(OcsHardware.id.in_(ids)))
+
+        dates = [h["lastdate"] for h in hardware if h["lastdate"]]
+        if dates:
+            state.watermark = max(dates + ([state.watermark] if state.watermark and not full else []))
+        state.last_sync_at = datetime.now()
+        if full:
+            state.last_full_sync_at = state.last_sync_at
+        state.last_error = None
+        state.machines = len(live_ids)
+        local_db.commit()
+        _last_sync_cache.invalidate()
+
+        result = {
+            "status": "success",
+            "full": full,
+            "updated": len(hardware),
+            "removed": len(removed),
+            "machines": len(live_ids),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        print(f"INFO: OCS mirror synced: {result}")
+        return result
+    except Exception as e:
+        local_db.rollback()
+        print(f"ERROR: OCS mirror sync failed: {e}")
+        try:
+            state = local_db.get(OcsSyncState, SYNC_STATE)
+            if state is not None:
+                state.last_error = str(e)[:500]
+                local_db.commit()
+        except Exception:
+            local_db.rollback()
+        return {"status": "error", "error": str(e)}
+    finally:
+        local_db.close()
+        ocs_db.close()
+
+async def run_sync_loop():
+    """
+    Background job started with the app: keeps the mirror within MAX_AGE of OCS.
+    """
+    if database.SessionOCS is None or SYNC_INTERVAL <= 0:
+        print("INFO: OCS mirror sync disabled.")
+        return
+    while True:
+        await asyncio.to_thread(sync)
+        await asyncio.sleep(SYNC_INTERVAL)
+
+def get_state(db: Session) -> OcsSyncState | None:
+    try:
+        return db.get(OcsSyncState, SYNC_STATE)
+    except Exception as e:
+        db.rollback()
+        print(f"ERROR: Failed to read OCS mirror state: {e}")
+        return None
+
+# (last_sync_at,) of the mirror, shared by every request for STATE_CACHE_TTL seconds
+_last_sync_cache = LRUCache(maxsize=1, ttl=STATE_CACHE_TTL)
+
+def is_fresh(db: Session) -> bool:
+    """
+    True when the mirror may answer instead of the live OCS database.
+    The sync time is read from the database at most once per STATE_CACHE_TTL.
+    """
+    if MAX_AGE <= 0:
+        return False
+    cached = _last_sync_cache.get(SYNC_STATE)
+    if cached is None:
+        state = get_state(db)
+        cached = (state.last_sync_at if state else None,)
+        if STATE_CACHE_TTL > 0:
+            _last_sync_cache.set(SYNC_STATE, cached)
+    last_sync_at = cached[0]
+    return bool(last_sync_at and last_sync_at >= datetime.now() - timedelta(seconds=MAX_AGE))
+
+def _active_filter():
+    tag = OcsAccountInfo.tag
+    return or_(tag.is_(None), and_(*[tag.notilike(pattern) for pattern in INACTIVE_TAGS]))
+
+def fetch_active_machines(db: Session) -> list[dict]:
+    """
+    Mirror version of the OCS inventory listing (machines not tagged as inactive).
+    """
+    rows = (
+        db.query(
+            OcsHardware.id, OcsHardware.name, OcsAccountInfo.tag, OcsHardware.memory, OcsHardware.processort,
+            OcsBios.smodel, OcsHardware.ipaddr, OcsHardware.userid, OcsHardware.osname, OcsHardware.lastdate
+        )
+        .outerjoin(OcsAccountInfo, OcsAccountInfo.hardware_id == OcsHardware.id)
+        .outerjoin(OcsBios, OcsBios.hardware_id == OcsHardware.id)
+        .filter(_active_filter())
+        .all()
+    )
+    return [
+        {
+            "id": r.id, "name": r.name, "tag": r.tag, "memory": r.memory, "processor": r.processort, "model": r.smodel,
+            "ip": r.ipaddr, "user": r.userid, "os": r.osname, "lastdate": r.lastdate
+        }
+        for r in rows
+    ]
+
+def get_machine_by_name(db: Session, name: str) -> dict | None:
+    """
+    Same shape as ocs.get_machine_by_name, answered from the mirror.
+    """
+    return _get_machine(db, func.upper(OcsHardware.name) == name.upper())
+
+def get_machine_by_id(db: Session, hardware_id: int) -> dict | None:
+    """
+    Same shape as ocs.get_machine_by_id, answered from the mirror.
+    """
+    return _get_machine(db, OcsHardware.id == hardware_id)
+
+def _get_machine(db: Session, condition) -> dict | None:
+    row = (
+        db.query(OcsHardware, OcsBios.smodel)
+        .outerjoin(OcsBios, OcsBios.hardware_id == OcsHardware.id)
+        .filter(condition)
+        .order_by(OcsHardware.lastdate.desc().nullslast())
+        .first()
+    )
+    if row is None:
+        return None
+    hardware, model = row
+
+    disk_size = db.query(func.sum(OcsStorage.disksize)).filter(OcsStorage.hardware_id == hardware.id).scalar()
+    ip = (
+        db.query(OcsNetwork.ipaddress)
+        .filter(OcsNetwork.hardware_id == hardware.id, OcsNetwork.ipaddress.like("10.20.%"))
+        .order_by(OcsNetwork.id)
+        .limit(1)
+        .scalar()
+    )
+    softwares = (
+        db.query(OcsSoftwareName.name.label("NAME"), OcsSoftwareVersion.version.label("VERSION"))
+        .select_from(OcsSoftware)
+        .join(OcsSoftwareName, OcsSoftware.name_id == OcsSoftwareName.id)
+        .outerjoin(OcsSoftwareVersion, OcsSoftware.version_id == OcsSoftwareVersion.id)
+        .filter(OcsSoftware.hardware_id == hardware.id)
+        .filter(*[OcsSoftwareName.name.notilike(pattern) for pattern in SOFTWARE_NOISE])
+        .order_by(OcsSoftwareName.name)
+        .limit(5)
+        .all()
+    )
+    return {
+        "ID": hardware.id,
+        "NAME": hardware.name,
+        "WORKGROUP": hardware.workgroup,
+        "OSNAME": hardware.osname,
+        "LASTDATE": hardware.lastdate,
+        "USERID": hardware.userid,
+        "MEMORY": hardware.memory,
+        "PROCESSOR": hardware.processort,
+        "MODEL": model,
+        "DISKSIZE": disk_size,
+        "IPADDR": ip or hardware.ipaddr,
+        "softwares": [dict(s._mapping) for s in softwares]
+    }
+
+def get_machines_by_names(db: Session, names: list[str]) -> dict[str, dict]:
+    """
+    Same shape as ocs.get_machines_by_names, answered from the mirror in three queries.
+    """
+    upper_names = list({name.upper() for name in names if name})
+    if not upper_names:
+        return {}
+    by_id = _get_machines(db, func.upper(OcsHardware.name).in_(upper_names))
+    machines = {}
+    for data in by_id.values(): # Oldest first: the latest duplicate wins
+        machines[data["NAME"].upper()] = data
+    return machines
+
+def get_machines_by_ids(db: Session, ids: list[int]) -> dict[int, dict]:
+    """
+    Same shape as ocs.get_machines_by_ids, answered from the mirror in three queries.
+    """
+    if not ids:
+        return {}
+    return _get_machines(db, OcsHardware.id.in_(ids))
+
+def _get_machines(db: Session, condition) -> dict[int, dict]:
+    rows = (
+        db.query(OcsHardware, OcsBios.smodel)
+        .outerjoin(OcsBios, OcsBios.hardware_id == OcsHardware.id)
+        .filter(condition)
+        .order_by(OcsHardware.lastdate.asc().nullsfirst())
+        .all()
+    )
+    by_id = {}
+    for hardware, model in rows:
+        by_id[hardware.id] = {
+            "ID": hardware.id,
+            "NAME": hardware.name,
+            "WORKGROUP": hardware.workgroup,
+            "OSNAME": hardware.osname,
+            "LASTDATE": hardware.lastdate,
+            "USERID": hardware.userid,
+            "MEMORY": hardware.memory,
+            "PROCESSOR": hardware.processort,
+            "MODEL": model,
+            "DISKSIZE": None,
+            "IPADDR": hardware.ipaddr
+        }
+    if not by_id:
+        return {}
+
+    ids = list(by_id)
+    disks = (
+        db.query(OcsStorage.hardware_id, func.sum(OcsStorage.disksize))
+        .filter(OcsStorage.hardware_id.in_(ids))
+        .group_by(OcsStorage.hardware_id)
+    )
+    for hardware_id, disk_size in disks:
+        by_id[hardware_id]["DISKSIZE"] = disk_size
+    ips = (
+        db.query(OcsNetwork.hardware_id, OcsNetwork.ipaddress)
+        .filter(OcsNetwork.hardware_id.in_(ids), OcsNetwork.ipaddress.like("10.20.%"))
+        .order_by(OcsNetwork.hardware_id, OcsNetwork.id)
+    )
+    preferred = {}
+    for hardware_id, ip in ips:
+        preferred.setdefault(hardware_id, ip)
+    for hardware_id, ip in preferred.items():
+        by_id[hardware_id]["IPADDR"] = ip
+    return by_id
+
+def get_softwares_by_ids(db: Session, ids: list[int], limit: int) -> dict[int, list[dict]]:
+    """
+    Same shape as ocs.get_softwares_by_ids, answered from the mirror.
+    """
+    rows = (
+        db.query(OcsSoftware.hardware_id, OcsSoftwareName.name, OcsSoftwareVersion.version)
+        .join(OcsSoftwareName, OcsSoftware.name_id == OcsSoftwareName.id)
+        .outerjoin(OcsSoftwareVersion, OcsSoftware.version_id == OcsSoftwareVersion.id)
+        .filter(OcsSoftware.hardware_id.in_(ids))
+        .filter(*[OcsSoftwareName.name.notilike(pattern) for pattern in SOFTWARE_NOISE])
+        .order_by(OcsSoftware.hardware_id, OcsSoftwareName.name)
+    )
+    softwares = {}
+    for hardware_id, name, version in rows:
+        items = softwares.setdefault(hardware_id, [])
+        if len(items) < limit:
+            items.append({"NAME": name, "VERSION": version})
+    return softwares
+
+def search_software_groups(db: Session, pattern: str, after: tuple | None, limit: int) -> list[tuple]:
+    """
+    Same rows as ocs.search_software's live query, answered from the mirror:
+    (software, name_id, version_key, version, machines) ordered by the keyset
+    (software, name_id, version_key), after the `after` key.
+    The name filter uses the trigram index on ocs_software_name.name.
+    """
+    version_key = func.coalesce(OcsSoftware.version_id, -1)
+    query = (
+        db.query(
+            OcsSoftwareName.name, OcsSoftware.name_id, version_key, OcsSoftwareVersion.version,
+            func.count(distinct(OcsSoftware.hardware_id))
+        )
+        .select_from(OcsSoftwareName)
+        .join(OcsSoftware, OcsSoftware.name_id == OcsSoftwareName.id)
+        .outerjoin(OcsSoftwareVersion, OcsSoftware.version_id == OcsSoftwareVersion.id)
+        .filter(OcsSoftwareName.name.ilike(pattern, escape="\\"))
+    )
+    if after:
+        query = query.filter(tuple_(OcsSoftwareName.name, OcsSoftware.name_id, version_key) > tuple_(*after))
+    return [
+        tuple(row) for row in query
+        .group_by(OcsSoftwareName.name, OcsSoftware.name_id, version_key, OcsSoftwareVersion.version)
+        .order_by(OcsSoftwareName.name, OcsSoftware.name_id, version_key)
+        .limit(limit)
+    ]
+
+def get_software_hostnames(db: Session, groups: list[tuple[int, int]], per_group: int) -> list[tuple]:
+    """
+    (name_id, version_key, hostname) of the machines with one of the (name_id, version_key)
+    software versions, at most per_group (first by hostname) per version.
+    """
+    if not groups or per_group <= 0:
+        return []
+    version_key = func.coalesce(OcsSoftware.version_id, -1)
+    pairs = (
+        db.query(OcsSoftware.name_id.label("name_id"), version_key.label("version_key"), OcsHardware.name.label("hostname"))
+        .join(OcsHardware, OcsSoftware.hardware_id == OcsHardware.id)
+        .filter(OcsSoftware.name_id.in_({name_id for name_id, _ in groups}))
+        .filter(tuple_(OcsSoftware.name_id, version_key).in_(groups))
+        .distinct()
+        .subquery()
+    )
+    position = func.row_number().over(
+        partition_by=(pairs.c.name_id, pairs.c.version_key), order_by=pairs.c.hostname
+    ).label("position")
+    ranked = db.query(pairs.c.name_id, pairs.c.version_key, pairs.c.hostname, position).subquery()
+    rows = (
+        db.query(ranked.c.name_id, ranked.c.version_key, ranked.c.hostname)
+        .filter(ranked.c.position <= per_group)
+        .order_by(ranked.c.hostname)
+    )
+    return [tuple(row) for row in rows]
@@ -0,0 +1,148 @@
+import os
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+
+# Suggestions need at least this similarity (1 - distance / longer normalized name)
+MIN_SIMILARITY = float(os.getenv("RECONCILE_MIN_SIMILARITY", "0.75"))
+# Candidates per name that get the exact edit distance computed (best trigram overlap first)
+MAX_CANDIDATES = 20
+# Matches kept per name for the one-to-one assignment
+MAX_MATCHES = 3
+# Trigrams shared by more names than this ('PC0', '000'...) are too common to narrow anything
+MAX_POSTING = int(os.getenv("RECONCILE_MAX_POSTING", "2000"))
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+def normalize(name: str | None) -> str:
+    """
+    Comparable form of a hostname: upper case, without the domain ('RJ-PC01.corp' -> 'RJ-PC01')
+    and without separators ('RJ-PC01' -> 'RJPC01').
+    """
+    if not name:
+        return ""
+    host = name.strip().upper().split(".")[0]
+    return _NON_ALNUM.sub("", host)
+
+def trigrams(value: str) -> set[str]:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Edit distance, or max_distance + 1 as soon as it is known to be larger.
+    Only the diagonal band of width 2 * max_distance + 1 is computed.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    too_far = max_distance + 1
+    previous = {j: j for j in range(min(len(b), max_distance) + 1)}
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        low, high = max(0, i - max_distance), min(len(b), i + max_distance)
+        current = {}
+        best = too_far
+        for j in range(low, high + 1):
+            if j == 0:
+                value = i
+            else:
+                value = previous.get(j - 1, too_far) + (char_a != b[j - 1])
+                deletion = previous.get(j, too_far) + 1
+                insertion = current.get(j - 1, too_far) + 1
+                if deletion < value:
+                    value = deletion
+                if insertion < value:
+                    value = insertion
+            current[j] = value
+            if value < best:
+                best = value
+        if best > max_distance:
+            return too_far
+        previous = current
+    return min(previous.get(len(b), too_far), too_far)
+
+class TrigramIndex:
+    """
+    Inverted index trigram -> names. A lookup only compares the query with names that share
+    trigrams with it (blocking), instead of with every name.
+    """
+
+    def __init__(self, names: list[str]):
+        self.names = names
+        self.normalized = [normalize(name) for name in names]
+        self._postings = defaultdict(list)
+        for position, value in enumerate(self.normalized):
+            for gram in trigrams(value):
+                self._postings[gram].append(position)
+
+    def candidates(self, value: str, max_distance: int, limit: int = MAX_CANDIDATES) -> list[int]:
+        """
+        Positions of the names sharing the most trigrams with value, among those that can
+        be within max_distance edits (an edit removes at most 3 of its distinct trigrams).
+        """
+        postings = [
+            posting for posting in (self._postings.get(gram) for gram in trigrams(value))
+            if posting and len(posting) <= MAX_POSTING
+        ]
+        # Trigrams missing from the index still count: the other name lacks them too
+        min_shared = len(trigrams(value)) - 3 * max_distance
+        shared = Counter(chain.from_iterable(postings))
+        return [position for position, count in shared.most_common(limit) if count >= min_shared]
+
+def suggest_matches(local_names: list[tuple[int, str]], ocs_names: list[str], min_similarity: float = MIN_SIMILARITY) -> list[dict]:
+    """
+    Proposes OCS hostnames for map computers that have no exact match.
+    local_names: (node id, name) of the computers missing in OCS; ocs_names: OCS machines missing in the map.
+    Each name is used at most once, best scores first:
+    [{'node_id', 'name', 'ocs_name', 'score', 'distance', 'reason'}]
+    """
+    if not local_names or not ocs_names:
+        return []
+    index = TrigramIndex(ocs_names)
+    exact = defaultdict(list)
+    for position, value in enumerate(index.normalized):
+        if value:
+            exact[value].append(position)
+
+    pairs = []
+    for node_id, name in local_names:
+        value = normalize(name)
+        if not value:
+            continue
+        if value in exact:
+            for position in exact[value]:
+                pairs.append((1.0, 0, node_id, name, position, "normalized"))
+            continue
+        # Bound for any candidate: distance <= longest * (1 - s) and longest <= len(value) + distance
+        query_distance = int(len(value) * (1 - min_similarity) / min_similarity)
+        matches = 0
+        for position in index.candidates(value, query_distance):
+            other = index.normalized[position]
+            longest = max(len(value), len(other))
+            max_distance = int(longest * (1 - min_similarity))
+            distance = levenshtein(value, other, max_distance)
+            if distance <= max_distance:
+                pairs.append((round(1 - distance / longest, 3), distance, node_id, name, position, "similar"))
+                matches += 1
+                if matches >= MAX_MATCHES:
+                    break
+
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[3]))
+    used_nodes, used_ocs = set(), set()
+    suggestions = []
+    for score, distance, node_id, name, position, reason in pairs:
+        if node_id in used_nodes or position in used_ocs:
+            continue
+        used_nodes.add(node_id)
+        used_ocs.add(position)
+        suggestions.append({
+            "node_id": node_id,
+            "name": name,
+            "ocs_name": index.names[position],
+            "score": score,
+            "distance": distance,
+            "reason": reason
+        })
+    return suggestions
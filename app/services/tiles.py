@@ -0,0 +1,64 @@
+import os
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app.core.cache import LRUCache
+from app.services import versions
+
+# Leaflet L.CRS.Simple: 1 map unit = 1 image pixel at zoom 0, 256px tiles, y grows upwards.
+TILE_SIZE = 256
+MVT_EXTENT = 4096
+MVT_BUFFER = 64 # Tile units kept around the edges so markers/labels aren't clipped
+MVT_LAYER = "nodes"
+
+# Keyed by nodes version, so any node write makes old entries unreachable (LRU drops them).
+tile_cache = LRUCache(maxsize=int(os.getenv("TILE_CACHE_SIZE", "2048")))
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """
+    Map-unit envelope (min_x, min_y, max_x, max_y) of Leaflet tile z/x/y in CRS.Simple.
+    The floor image spans x in [0, width] and y in [0, height], so y tiles are negative.
+    """
+    size = TILE_SIZE / (2 ** z)
+    return (x * size, -(y + 1) * size, (x + 1) * size, -y * size)
+
+def get_floor_tile(db: Session, floor, z: int, x: int, y: int) -> bytes:
+    """
+    Mapbox Vector Tile with the nodes of one floor, built by PostGIS (ST_AsMVT).
+    Attributes are the same properties as NetworkNode.to_geojson().
+    """
+    min_x, min_y, max_x, max_y = tile_bounds(z, x, y)
+
+    # Tiles entirely outside the floor plan are always empty
+    if max_x < 0 or min_y > (floor.height or 0) or min_x > (floor.width or 0) or max_y < 0:
+        return b""
+
+    version = versions.current(db, versions.NODES)
+    key = (floor.id, z, x, y, version)
+    tile = tile_cache.get(key)
+    if tile is not None:
+        return tile
+
+    query = text("""
+        WITH bounds AS (
+            SELECT ST_MakeEnvelope(:min_x, :min_y, :max_x, :max_y, 4326) AS geom
+        ),
+        mvtgeom AS (
+            SELECT ST_AsMVTGeom(n.geom, bounds.geom, :extent, :buffer, true) AS geom,
+                   n.id AS fid, n.id, n.name, n.type, n.ip_address, n.point_number,
+                   n.floor_id, n.assigned_to, n.details
+            FROM network_nodes n, bounds
+            WHERE n.floor_id = :floor_id
+              AND n.geom && ST_Expand(bounds.geom, :margin)
+        )
+        SELECT ST_AsMVT(mvtgeom.*, :layer, :extent, 'geom', 'fid') FROM mvtgeom
+    """)
+    margin = (max_x - min_x) * MVT_BUFFER / MVT_EXTENT
+    tile = db.execute(query, {
+        "min_x": min_x, "min_y": min_y, "max_x": max_x, "max_y": max_y,
+        "extent": MVT_EXTENT, "buffer": MVT_BUFFER, "margin": margin,
+        "floor_id": floor.id, "layer": MVT_LAYER
+    }).scalar()
+    tile = bytes(tile) if tile else b""
+
+    tile_cache.set(key, tile)
+    return tile
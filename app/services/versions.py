@@ -0,0 +1,26 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.models.data_version import DataVersion
+
+NODES = "nodes"
+FLOORS = "floors"
+
+def bump(db: Session, *names: str):
+    """
+    Increments the version of each dataset inside the caller's transaction.
+    The caller commits, so the new version becomes visible together with the data.
+    """
+    for name in names:
+        stmt = insert(DataVersion).values(name=name, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DataVersion.name],
+            set_={"version": DataVersion.version + 1}
+        )
+        db.execute(stmt)
+
+def current(db: Session, name: str) -> int:
+    """
+    Returns the current version of a dataset (0 if it was never written).
+    """
+    version = db.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+    return version or 0
@@ -0,0 +1,37 @@
+from sqlalchemy import text, inspect
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import engine
+
+COLUMNS = {
+    "tiles_path": "VARCHAR",
+    "preview_path": "VARCHAR",
+    "tile_min_zoom": "INTEGER",
+    "pending_image_path": "VARCHAR",
+    "pending_width": "INTEGER",
+    "pending_height": "INTEGER",
+}
+
+def migrate():
+    print("INFO: Checking floors schema...")
+    inspector = inspect(engine)
+    columns = [c['name'] for c in inspector.get_columns('floors')]
+
+    for name, ddl_type in COLUMNS.items():
+        if name in columns:
+            print(f"INFO: Column '{name}' already exists.")
+            continue
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(f"ALTER TABLE floors ADD COLUMN {name} {ddl_type};"))
+                conn.commit()
+            print(f"SUCCESS: Added column '{name}'.")
+        except Exception as e:
+            print(f"ERROR: Migration of '{name}' failed: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,33 @@
+from sqlalchemy import text
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import engine
+
+# create_all() only builds indexes together with new tables, so databases
+# created before these indexes existed need them added explicitly.
+INDEXES = [
+    ("pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm;"),
+    ("idx_network_nodes_geom", "CREATE INDEX IF NOT EXISTS idx_network_nodes_geom ON network_nodes USING GIST (geom);"),
+    ("ix_network_nodes_floor_id_type", "CREATE INDEX IF NOT EXISTS ix_network_nodes_floor_id_type ON network_nodes (floor_id, type);"),
+    ("ix_network_nodes_name_trgm", "CREATE INDEX IF NOT EXISTS ix_network_nodes_name_trgm ON network_nodes USING GIN (name gin_trgm_ops);"),
+    ("ix_network_nodes_assigned_to_trgm", "CREATE INDEX IF NOT EXISTS ix_network_nodes_assigned_to_trgm ON network_nodes USING GIN (assigned_to gin_trgm_ops);"),
+    ("ix_network_nodes_point_number_trgm", "CREATE INDEX IF NOT EXISTS ix_network_nodes_point_number_trgm ON network_nodes USING GIN (point_number gin_trgm_ops);"),
+]
+
+def migrate():
+    print("INFO: Checking network_nodes indexes...")
+    for name, ddl in INDEXES:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(ddl))
+                conn.commit()
+            print(f"SUCCESS: '{name}' is present.")
+        except Exception as e:
+            print(f"ERROR: Failed to create '{name}': {e}")
+
+if __name__ == "__main__":
+    migrate()
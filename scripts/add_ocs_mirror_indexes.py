@@ -0,0 +1,29 @@
+from sqlalchemy import text
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import engine
+
+# Mirror tables created before the software search indexes existed need them added explicitly.
+INDEXES = [
+    ("pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm;"),
+    ("ix_ocs_software_name_name_trgm", "CREATE INDEX IF NOT EXISTS ix_ocs_software_name_name_trgm ON ocs_software_name USING GIN (name gin_trgm_ops);"),
+    ("ix_ocs_software_name_version", "CREATE INDEX IF NOT EXISTS ix_ocs_software_name_version ON ocs_software (name_id, version_id, hardware_id);"),
+]
+
+def migrate():
+    print("INFO: Checking OCS mirror indexes...")
+    for name, ddl in INDEXES:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(ddl))
+                conn.commit()
+            print(f"SUCCESS: '{name}' is present.")
+        except Exception as e:
+            print(f"ERROR: Failed to create '{name}': {e}")
+
+if __name__ == "__main__":
+    migrate()
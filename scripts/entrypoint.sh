@@ -15,10 +15,24 @@ echo "Running migrations..."
 if [ -f "scripts/migrate_user_table.py" ]; then
     python scripts/migrate_user_table.py
 fi
+if [ -f "scripts/add_node_indexes.py" ]; then
+    python scripts/add_node_indexes.py
+fi
+if [ -f "scripts/add_floor_tiles_columns.py" ]; then
+    python scripts/add_floor_tiles_columns.py
+fi
+if [ -f "scripts/add_ocs_mirror_indexes.py" ]; then
+    python scripts/add_ocs_mirror_indexes.py
+fi
+
+if [ -f "scripts/precompress_static.py" ]; then
+    python scripts/precompress_static.py
+fi
 
 echo "Starting scripts/seed_admin.py..."
 python scripts/seed_admin.py
 
 # 4. Start Uvicorn
 echo "Starting Uvicorn..."
+# Single worker: export jobs (app/services/export_jobs.py) are kept in process memory
 exec uvicorn app.main:app --host 0.0.0.0 --port 8000
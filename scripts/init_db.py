@@ -6,7 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import engine, Base
 # Import all models to ensure they are registered with Base.metadata
-from app.models import user, floor, node
+from app.models import user, floor, node, data_version, node_change, floor_image_variant, ocs_mirror, node_ocs_binding
 
 def init_db():
     print("Creating all tables in the database...")
@@ -0,0 +1,52 @@
+import gzip
+import os
+import sys
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "..", "static")
+# Text assets only; floor images are already compressed formats
+EXTENSIONS = (".html", ".js", ".css", ".svg", ".json")
+MINIMUM_SIZE = 500
+
+def _write_if_stale(source: str, target: str, data_fn):
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return False
+    with open(source, "rb") as f:
+        data = data_fn(f.read())
+    with open(target, "wb") as f:
+        f.write(data)
+    return True
+
+def precompress():
+    """
+    Writes file.gz (and file.br when brotli is installed) next to every text asset,
+    served by PrecompressedStaticFiles in app/main.py.
+    """
+    print("INFO: Precompressing static assets...")
+    if brotli is None:
+        print("WARNING: brotli not installed, generating .gz only.")
+
+    count = 0
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            if not name.endswith(EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            if os.path.getsize(source) < MINIMUM_SIZE:
+                continue
+            if _write_if_stale(source, source + ".gz", lambda d: gzip.compress(d, compresslevel=9)):
+                count += 1
+            if brotli is not None and _write_if_stale(source, source + ".br", lambda d: brotli.compress(d, quality=11)):
+                count += 1
+
+    print(f"SUCCESS: {count} compressed file(s) written.")
+
+if __name__ == "__main__":
+    precompress()